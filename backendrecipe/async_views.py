@@ -0,0 +1,71 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, ParseError, Throttled
+from rest_framework.settings import api_settings
+from backendrecipe.renderers import FastJSONRenderer
+from user.authentication import CachedJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """
+    Base for the async endpoints, which DRF can not serve. Requests are
+    authenticated like the rest of the API, DRF exceptions become the same JSON
+    error responses and bodies are rendered with FastJSONRenderer. Views with a
+    `throttle_scope` are throttled like APIView.
+    """
+    authentication_class = CachedJWTAuthentication
+    authentication_required = True
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    renderer = FastJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like APIView: clients authenticate with tokens, not session cookies.
+        view.csrf_exempt = True
+        return view
+
+    async def authenticate(self, request):
+        result = await sync_to_async(self.authentication_class().authenticate)(request)
+        if result is None:
+            if self.authentication_required:
+                raise NotAuthenticated()
+            return AnonymousUser()
+        return result[0]
+
+    async def check_throttles(self, request):
+        waits = []
+        for throttle in (throttle_class() for throttle_class in self.throttle_classes):
+            if not await sync_to_async(throttle.allow_request)(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise Throttled(max(waits))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await self.authenticate(request)
+            await self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = self.render(detail, exc.status_code)
+            if getattr(exc, "wait", None):
+                response["Retry-After"] = str(math.ceil(exc.wait))
+            return response
+
+    def parse(self, request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as exc:
+                raise ParseError(f"JSON parse error - {exc}")
+        return request.POST
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status_code, content_type=self.renderer.media_type)
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a bounded size (least recently used entries
+    are evicted first) and per-entry expiry.
+
+    Negative results can be kept for a different time than positive ones, and
+    pending ones (an answer that is not ready yet) for a third. Once an
+    entry expires it is still served for `stale_ttl` more seconds while a background
+    worker reloads it, so readers never wait on the loader for a key they have seen.
+    """
+
+    def __init__(self, max_size=1024, ttl=300, negative_ttl=None, stale_ttl=0, is_negative=None,
+                 pending_ttl=None, is_pending=None, refresh_workers=2, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.pending_ttl = ttl if pending_ttl is None else pending_ttl
+        self.stale_ttl = stale_ttl
+        self.is_negative = is_negative or (lambda value: False)
+        self.is_pending = is_pending or (lambda value: False)
+        self.refresh_workers = refresh_workers
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self._lookup(key)[0] == "fresh"
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return "missing", None
+            value, expires_at = entry
+            now = self.clock()
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                return "fresh", value
+            if now < expires_at + self.stale_ttl:
+                self._entries.move_to_end(key)
+                return "stale", value
+            del self._entries[key]
+            return "missing", None
+
+    def get(self, key, default=None):
+        state, value = self._lookup(key)
+        return default if state == "missing" else value
+
+    def set(self, key, value):
+        if self.is_pending(value):
+            ttl = self.pending_ttl
+        else:
+            ttl = self.negative_ttl if self.is_negative(value) else self.ttl
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(self, key, loader):
+        state, value = self._lookup(key)
+        if state == "fresh":
+            return value
+        if state == "stale":
+            self._refresh(key, loader)
+            return value
+        value = loader(key)
+        self.set(key, value)
+        return value
+
+    async def aget_or_load(self, key, loader):
+        """get_or_load for a coroutine `loader`; stale entries are reloaded in a task."""
+        state, value = self._lookup(key)
+        if state == "fresh":
+            return value
+        if state == "stale":
+            with self._lock:
+                if key in self._refreshing:
+                    return value
+                self._refreshing.add(key)
+            asyncio.get_running_loop().create_task(self._areload(key, loader))
+            return value
+        value = await loader(key)
+        self.set(key, value)
+        return value
+
+    async def _areload(self, key, loader):
+        try:
+            self.set(key, await loader(key))
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _refresh(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.refresh_workers,
+                                                    thread_name_prefix="cache-refresh")
+        self._executor.submit(self._reload, key, loader)
+
+    def _reload(self, key, loader):
+        try:
+            self.set(key, loader(key))
+        except Exception:
+            # Keep serving the stale value, the next read past expiry retries.
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,201 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    """Shape of a statement: literals and IN lists of any length look the same."""
+    return _LITERAL.sub("?", _PLACEHOLDER_LIST.sub("(...)", sql))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield "_bucket", (("le", f"{bound:g}"),), cumulative
+        yield "_bucket", (("le", "+Inf"),), self.count
+        yield "_sum", (), self.sum
+        yield "_count", (), self.count
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = defaultdict(dict)
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self._metrics[name] = (kind, help_text, buckets)
+
+    def inc(self, name, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values[name]
+            if key not in values:
+                values[key] = Histogram(self._metrics[name][2])
+            values[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in self._metrics.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in sorted(self._values.get(name, {}).items()):
+                    if kind == "histogram":
+                        for suffix, extra, sample in value.samples():
+                            lines.append(f"{name}{suffix}{_labels(labels + extra)} {sample!r}")
+                    else:
+                        lines.append(f"{name}{_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+registry.describe("http_request_duration_seconds", "histogram",
+                  "Time spent handling a request.", LATENCY_BUCKETS)
+registry.describe("db_queries_per_request", "histogram",
+                  "SQL statements issued by one request.", QUERY_COUNT_BUCKETS)
+registry.describe("db_query_duration_seconds_total", "counter",
+                  "Time spent in SQL statements.")
+registry.describe("outbound_http_duration_seconds", "histogram",
+                  "Time spent calling external APIs.", LATENCY_BUCKETS)
+registry.describe("outbound_http_errors_total", "counter",
+                  "External API calls that raised.")
+registry.describe("n_plus_one_suspected_total", "counter",
+                  "Requests that repeated one SQL statement shape at least METRICS['N_PLUS_ONE_THRESHOLD'] times.")
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.queries += 1
+            self.statements[sql] += 1
+
+
+@contextmanager
+def track_outbound(service):
+    """Record how long a call to an external `service` takes."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc("outbound_http_errors_total", {"service": service})
+        raise
+    finally:
+        registry.observe("outbound_http_duration_seconds", {"service": service}, time.perf_counter() - start)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Records latency and SQL statements per route. Statements are counted by their
+    raw text while the request runs and only normalised afterwards, when the
+    request issued enough of them to possibly contain an N+1 pattern.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.n_plus_one_threshold = settings.METRICS["N_PLUS_ONE_THRESHOLD"]
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        stats = RequestStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        self.record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        # Under ASGI the ORM runs on other threads than this one, so only latency is recorded.
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, None, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, stats, duration):
+        match = getattr(request, "resolver_match", None)
+        route = "/" + match.route if match is not None else "unmatched"
+        labels = {"route": route, "method": request.method, "status": str(response.status_code)}
+        registry.observe("http_request_duration_seconds", labels, duration)
+        if stats is None:
+            return
+        registry.observe("db_queries_per_request", {"route": route}, stats.queries)
+        registry.inc("db_query_duration_seconds_total", {"route": route}, stats.query_time)
+
+        if stats.queries < self.n_plus_one_threshold:
+            return
+        shapes = Counter()
+        for sql, count in stats.statements.items():
+            shapes[normalize_sql(sql)] += count
+        repeated = [(sql, count) for sql, count in shapes.items() if count >= self.n_plus_one_threshold]
+        if repeated:
+            registry.inc("n_plus_one_suspected_total", {"route": route})
+            for sql, count in repeated:
+                logger.warning("Possible N+1 on %s: %d x %s", route, count, sql)
+
+
+def metrics_view(request):
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS["ALLOWED_IPS"]:
+        raise Http404
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
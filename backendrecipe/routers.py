@@ -0,0 +1,90 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_KEY = "db:pin:{}"
+RESOURCE_PIN_KEY = "db:pin:resource:{}"
+
+# Replica the current request reads from, one per request so all its queries read the same copy.
+_replica = ContextVar("replica", default=None)
+
+
+def pin_to_primary(user_id):
+    cache.set(PIN_KEY.format(user_id), True, timeout=settings.READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return cache.get(PIN_KEY.format(user_id), False)
+
+
+def pin_resources_to_primary(*resources):
+    """Serve reads of `resources` from the primary until the replicas have their latest change."""
+    if settings.REPLICA_DATABASES and resources:
+        cache.set_many({RESOURCE_PIN_KEY.format(resource): True for resource in resources},
+                       timeout=settings.READ_YOUR_WRITES_SECONDS)
+
+
+def are_pinned_to_primary(*resources):
+    return bool(resources) and bool(cache.get_many([RESOURCE_PIN_KEY.format(resource) for resource in resources]))
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes, and reads outside ReplicaReadMixin views, go to the primary. Reads
+    inside them go to the replica the view picked. Replicas are copies of the
+    primary, so only the primary is migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
+
+
+class ReplicaReadMixin:
+    """
+    Serves safe requests of a view from a random one of REPLICA_DATABASES,
+    unless the user wrote something in the last READ_YOUR_WRITES_SECONDS or
+    the view's ETag resources changed in that time.
+    """
+
+    def get_replica_resources(self):
+        # An ETag names the latest version, the body must not come from a replica that is behind it.
+        return self.get_etag_resources() if hasattr(self, "get_etag_resources") else ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and settings.REPLICA_DATABASES and not (
+                request.user.is_authenticated and is_pinned_to_primary(request.user.pk)) and \
+                not are_pinned_to_primary(*self.get_replica_resources()):
+            self._replica_token = _replica.set(random.choice(settings.REPLICA_DATABASES))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = self.__dict__.pop("_replica_token", None)
+        if token is not None:
+            _replica.reset(token)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware(MiddlewareMixin):
+    """Pins users to the primary after a successful unsafe request."""
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and settings.REPLICA_DATABASES:
+            # DRF sets the user it authenticated on the Django request as well.
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
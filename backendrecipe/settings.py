@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -46,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backendrecipe.metrics.MetricsMiddleware',
+    'backendrecipe.routers.ReadYourWritesMiddleware',
+    'backendrecipe.throttling.RateLimitHeadersMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,12 +83,95 @@ WSGI_APPLICATION = 'backendrecipe.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# Postgres when DB_HOST is set (see docker-compose.yml), otherwise the local
+# SQLite file. DB_REPLICAS lists read replicas: hosts for Postgres, database
+# files for SQLite. They are only read by views using ReplicaReadMixin.
+
+if os.environ.get('DB_HOST'):
+    PRIMARY_DATABASE = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'HOST': os.environ['DB_HOST'],
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'NAME': os.environ.get('DB_NAME', 'postgres'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+    }
+    REPLICA_SETTING = 'HOST'
+else:
+    PRIMARY_DATABASE = {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
-}
+    REPLICA_SETTING = 'NAME'
+
+DATABASES = {'default': PRIMARY_DATABASE}
+for number, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica{number}'] = {**PRIMARY_DATABASE, REPLICA_SETTING: replica.strip(),
+                                     'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['backendrecipe.routers.PrimaryReplicaRouter']
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+# Seconds a user's reads stay on the primary after they wrote something, so
+# they see their own changes while the replicas catch up. Lists with an ETag
+# read from the primary for as long after their data changed, so a new ETag is
+# never paired with a body a replica has not caught up with.
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 5))
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Version stamps used for ETags and the rate limit counters live here, so with
+# more than one worker process they must share a cache: set REDIS_URL (e.g.
+# redis://redis:6379/0) or MEMCACHED_LOCATION (e.g. memcached:11211). The
+# process local LocMemCache is only meant for development.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached list response (e.g. a user's own recipes) is kept.
+RECIPE_LIST_CACHE_TIMEOUT = 60 * 5
+
+# Seconds before the in-process ingredient autocomplete index is reloaded, so
+# ingredients created by other worker processes show up.
+INGREDIENT_SUGGEST_REFRESH = 60 * 5
+
+# File written by `manage.py build_similarity_index` that workers read the
+# recipe similarity index from (and read again when it is rebuilt). Without it
+# every worker loads the index from the database, again every
+# RECIPE_SIMILARITY_REFRESH seconds.
+RECIPE_SIMILARITY_INDEX = os.environ.get("RECIPE_SIMILARITY_INDEX")
+RECIPE_SIMILARITY_REFRESH = 60 * 5
+
+# Build recipe list responses from values() rows instead of RecipesSerializer.
+# The JSON is identical, it is only cheaper to produce.
+RECIPE_PROJECTED_LISTS = False
+
+# Recipes are ranked by their average rating after adding this many votes of
+# this value, so a single 5 star vote can not top the list. Run
+# `manage.py backfill_rating_aggregates` after changing them.
+RECIPE_RATING_PRIOR_MEAN = 3.0
+RECIPE_RATING_PRIOR_WEIGHT = 10
 
 
 # Password validation
@@ -133,8 +220,30 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
-    ]
+        'user.authentication.CachedJWTAuthentication'
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'backendrecipe.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Views opt in with throttle_scope: "<scope>" limits each user, "<scope>_ip" each client address.
+    # Counters live in the default cache, so workers share them only with a shared cache backend.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'backendrecipe.throttling.ScopedThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'create': '120/min',
+        'create_ip': '600/min',
+        'bulk_create': '20/min',
+        'bulk_create_ip': '100/min',
+        'ingredient': '60/min',
+        'ingredient_ip': '300/min',
+        'rate': '60/min',
+        'rate_ip': '300/min',
+        'register_ip': '20/hour',
+        'enrichment': '60/min',
+        'enrichment_ip': '300/min',
+    },
 }
 AUTH_USER_MODEL = "user.User"
 
@@ -142,6 +251,51 @@ API_HUNTER_KEY = "2f036b62ce7986663a838db93924f846b9d48b1f"
 
 API_CLEARBIT_KEY = "sk_7ff9a32912190abf1e7d7345698d17e0"
 
+HUNTER_API_URL = "https://api.hunter.io/v2"
+
+CLEARBIT_STREAM_URL = "https://person-stream.clearbit.com/v2/combined/find"
+
+# Seconds before a call to Hunter or Clearbit gives up.
+OUTBOUND_HTTP_TIMEOUT = 10
+
+# In-process cache of Clearbit enrichment results, times are in seconds.
+# PENDING_TTL is how soon a lookup Clearbit is still working on is asked again.
+CLEARBIT_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60 * 60 * 24,
+    'NEGATIVE_TTL': 60 * 60,
+    'PENDING_TTL': 60,
+    'STALE_TTL': 60 * 60 * 24 * 7,
+}
+
+# How registration verifies email addresses with Hunter. In "background" mode the
+# account is created as pending and verified by a worker pool after the response.
+# Failed lookups are retried RETRIES times, RETRY_BACKOFF seconds apart and
+# doubling; accounts still pending after that are retried by
+# `manage.py reverify_pending_emails`.
+EMAIL_VERIFICATION = {
+    'MODE': 'sync',
+    'VERIFIER': 'backendrecipe.verification.HunterVerifier',
+    'VERIFIER_OPTIONS': {},
+    'WORKERS': 4,
+    'CACHE_SIZE': 10000,
+    'ADDRESS_TTL': 60 * 60 * 24,
+    'DOMAIN_TTL': 60 * 60 * 24 * 7,
+    'DISPOSABLE_DOMAINS': [],
+    'RETRIES': 3,
+    'RETRY_BACKOFF': 2,
+}
+
+# Request metrics served on /metrics. A request that runs the same statement
+# shape N_PLUS_ONE_THRESHOLD times is logged as a likely N+1 query.
+METRICS = {
+    'N_PLUS_ONE_THRESHOLD': 10,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# Seconds an authenticated user is served from the cache instead of the users table.
+AUTH_USER_CACHE_TIMEOUT = 60
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15)
 }
@@ -0,0 +1,145 @@
+import time
+
+from django.core.cache import cache as default_cache
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Limits requests to the rate configured for the view's `throttle_scope` (plus
+    `scope_suffix`) in DEFAULT_THROTTLE_RATES, over a sliding window.
+
+    The window is estimated from two fixed window counters: the previous one,
+    weighted by how much of it still overlaps the sliding window, plus the
+    current one. That is one get_many and one incr in the shared cache per
+    request, however high the rate, instead of a list of timestamps per client.
+    Views may limit the checked methods with `throttle_methods`.
+    """
+    cache = default_cache
+    cache_format = "throttle:{scope}:{ident}:{window}"
+    scope_suffix = ""
+    timer = time.time
+
+    def get_ident_key(self, request):
+        """Who is limited, or None to not limit this request."""
+        raise NotImplementedError(".get_ident_key() must be overridden")
+
+    def get_rate(self, view):
+        scope = getattr(view, "throttle_scope", None)
+        if scope is None:
+            return None, None
+        scope += self.scope_suffix
+        # Read on every request, so the rates can be changed with override_settings.
+        return scope, api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def check(self, request, view):
+        """Whether the request fits in the window, without counting it."""
+        self.key = None
+        methods = getattr(view, "throttle_methods", None)
+        if methods is not None and request.method not in methods:
+            return True
+        scope, rate = self.get_rate(view)
+        ident = self.get_ident_key(request) if rate else None
+        if ident is None:
+            return True
+
+        self.num_requests, self.duration = SimpleRateThrottle.parse_rate(None, rate)
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        current_key, previous_key = (self.cache_format.format(scope=scope, ident=ident, window=number)
+                                     for number in (window, window - 1))
+        counts = self.cache.get_many([current_key, previous_key])
+        self.key = current_key
+        self.previous = counts.get(previous_key, 0)
+        self.used = self.previous * (1 - self.elapsed / self.duration) + counts.get(current_key, 0)
+        return self.used + 1 <= self.num_requests
+
+    def hit(self, request, allowed):
+        """Count the checked request if it is `allowed` and report the budget left."""
+        if self.key is None:
+            return
+        if allowed:
+            # Counters outlive their window by one, while they are the previous window.
+            if not self.cache.add(self.key, 1, timeout=2 * self.duration + 1):
+                try:
+                    self.cache.incr(self.key)
+                except ValueError:
+                    self.cache.set(self.key, 1, timeout=2 * self.duration + 1)
+            self.used += 1
+        record_rate_limit(request, self.num_requests, max(0, int(self.num_requests - self.used)),
+                          self.duration - self.elapsed)
+
+    def allow_request(self, request, view):
+        allowed = self.check(request, view)
+        self.hit(request, allowed)
+        return allowed
+
+    def wait(self):
+        excess = self.used + 1 - self.num_requests
+        weight = 1 - self.elapsed / self.duration
+        if self.previous and excess <= self.previous * weight:
+            # The previous window's share shrinks by previous / duration every second.
+            return excess * self.duration / self.previous
+        return self.duration - self.elapsed
+
+
+class ScopedUserThrottle(SlidingWindowThrottle):
+    """Limits authenticated users by `<throttle_scope>`; anonymous requests are left to ScopedIPThrottle."""
+
+    def get_ident_key(self, request):
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        return f"user:{user.pk}"
+
+
+class ScopedIPThrottle(SlidingWindowThrottle):
+    """Limits every client address by `<throttle_scope>_ip`."""
+    scope_suffix = "_ip"
+
+    def get_ident_key(self, request):
+        return f"ip:{self.get_ident(request)}"
+
+
+class ScopedThrottle(BaseThrottle):
+    """
+    Applies ScopedUserThrottle and ScopedIPThrottle together and counts the
+    request against either only when both allow it, so a request one of them
+    turns away does not use up the other's budget.
+    """
+    throttle_classes = (ScopedUserThrottle, ScopedIPThrottle)
+
+    def allow_request(self, request, view):
+        throttles = [throttle_class() for throttle_class in self.throttle_classes]
+        checks = [throttle.check(request, view) for throttle in throttles]
+        allowed = all(checks)
+        for throttle in throttles:
+            throttle.hit(request, allowed)
+        self.waits = [throttle.wait() for throttle, fits in zip(throttles, checks) if not fits]
+        return allowed
+
+    def wait(self):
+        return max(self.waits, default=None)
+
+
+def record_rate_limit(request, limit, remaining, reset):
+    # Kept on the Django request, where RateLimitHeadersMiddleware finds it.
+    request = getattr(request, "_request", request)
+    limits = request.__dict__.setdefault("rate_limits", [])
+    limits.append((limit, remaining, reset))
+
+
+class RateLimitHeadersMiddleware(MiddlewareMixin):
+    """Tells clients the budget left under the tightest limit checked for their request."""
+
+    def process_response(self, request, response):
+        limits = getattr(request, "rate_limits", None)
+        if limits:
+            limit, remaining, reset = min(limits, key=lambda item: item[1])
+            response["X-RateLimit-Limit"] = str(limit)
+            response["X-RateLimit-Remaining"] = str(remaining)
+            response["X-RateLimit-Reset"] = str(int(reset + 0.5))
+        return response
@@ -15,11 +15,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from backendrecipe.metrics import metrics_view
 
 app_name = 'user'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
-    path('api/recipes/', include('recipes.urls'))
+    path('api/recipes/', include('recipes.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
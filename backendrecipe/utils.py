@@ -1,23 +1,107 @@
 from recipes.models import RecipeRating, Recipe
 from backendrecipe.settings import API_HUNTER_KEY, API_CLEARBIT_KEY
+from backendrecipe.caches import TTLCache
+from backendrecipe.metrics import track_outbound
+from django.conf import settings
+import asyncio
+import weakref
 import requests
 import clearbit
+from clearbit.enrichment import PersonCompany
+from asgiref.sync import sync_to_async
 from rest_framework import serializers, status
 
-def hunter_verify(email):
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+NO_CLEARBIT_INFO = "There is no additional information"
+
+def is_clearbit_pending(value):
+    # What the clearbit client returns while Clearbit is still looking the person up (202).
+    return isinstance(value, dict) and value.get("pending") is True
+
+def hunter_status(email):
     api_key = API_HUNTER_KEY
-    response = requests.get(f"https://api.hunter.io/v2/email-verifier?email={email}&api_key={api_key}")
+    with track_outbound("hunter"):
+        response = requests.get(f"{settings.HUNTER_API_URL}/email-verifier",
+                                params={"email": email, "api_key": api_key},
+                                timeout=settings.OUTBOUND_HTTP_TIMEOUT)
     if response.status_code != status.HTTP_200_OK:
         raise serializers.ValidationError(f"Check mail error {response.status_code}")
-    response_status = response.json()['data']['status']
+    return response.json()['data']['status']
+
+def hunter_verify(email):
+    response_status = hunter_status(email)
     if response_status == 'invalid' or response_status == "disposable":
         return False
     return True
 
 def clearbit_info(email):
     clearbit.key = API_CLEARBIT_KEY
-    response = clearbit.Enrichment.find(email=email, stream=True)
+    with track_outbound("clearbit"):
+        response = clearbit.Enrichment.find(email=email, stream=True)
     if response is not None:
         return response
     else:
-        return "There is no additional information"
\ No newline at end of file
+        return NO_CLEARBIT_INFO
+
+_clearbit_cache = None
+
+def get_clearbit_cache():
+    global _clearbit_cache
+    if _clearbit_cache is None:
+        options = settings.CLEARBIT_CACHE
+        _clearbit_cache = TTLCache(max_size=options["MAX_SIZE"],
+                                   ttl=options["TTL"],
+                                   negative_ttl=options["NEGATIVE_TTL"],
+                                   stale_ttl=options["STALE_TTL"],
+                                   is_negative=lambda value: value == NO_CLEARBIT_INFO,
+                                   pending_ttl=options.get("PENDING_TTL", 60),
+                                   is_pending=is_clearbit_pending)
+    return _clearbit_cache
+
+def cached_clearbit_info(email):
+    return get_clearbit_cache().get_or_load(email.lower(), clearbit_info)
+
+# Async variants for the ASGI views. Without httpx they run the sync functions
+# on a worker thread, which still keeps the event loop free.
+
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_client():
+    """One httpx client per event loop, its connections can not be shared between loops."""
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = httpx.AsyncClient(timeout=settings.OUTBOUND_HTTP_TIMEOUT)
+    return _async_clients[loop]
+
+async def hunter_status_async(email):
+    if httpx is None:
+        return await sync_to_async(hunter_status, thread_sensitive=False)(email)
+    with track_outbound("hunter"):
+        response = await get_async_client().get(f"{settings.HUNTER_API_URL}/email-verifier",
+                                                params={"email": email, "api_key": API_HUNTER_KEY})
+    if response.status_code != status.HTTP_200_OK:
+        raise serializers.ValidationError(f"Check mail error {response.status_code}")
+    return response.json()['data']['status']
+
+async def clearbit_info_async(email):
+    if httpx is None:
+        return await sync_to_async(clearbit_info, thread_sensitive=False)(email)
+    # The same streaming lookup clearbit.Enrichment.find(stream=True) makes.
+    with track_outbound("clearbit"):
+        response = await get_async_client().get(settings.CLEARBIT_STREAM_URL, params={"email": email},
+                                                auth=(API_CLEARBIT_KEY, ""))
+    # Answered like clearbit_info: the client's PersonCompany, raising for error statuses.
+    if response.status_code == status.HTTP_200_OK:
+        return PersonCompany(response.json())
+    if response.status_code == status.HTTP_202_ACCEPTED:
+        return PersonCompany({"pending": True})
+    if response.status_code != status.HTTP_404_NOT_FOUND:
+        response.raise_for_status()
+    return NO_CLEARBIT_INFO
+
+async def cached_clearbit_info_async(email):
+    return await get_clearbit_cache().aget_or_load(email.lower(), clearbit_info_async)
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from backendrecipe.caches import TTLCache
+
+logger = logging.getLogger(__name__)
+
+REJECTED_STATUSES = ("invalid", "disposable")
+
+
+def email_domain(email):
+    return email.rsplit("@", 1)[-1].lower()
+
+
+class HunterVerifier:
+    """Asks Hunter's email verifier for the status of an address."""
+
+    def __init__(self, **options):
+        pass
+
+    def status(self, email):
+        from backendrecipe.utils import hunter_status
+        return hunter_status(email)
+
+    async def astatus(self, email):
+        from backendrecipe.utils import hunter_status_async
+        return await hunter_status_async(email)
+
+
+class FakeVerifier:
+    """
+    Offline stand-in for Hunter. Every lookup sleeps for `latency` seconds and
+    returns the status configured for the address or its domain, else `default`.
+    The first `failures` lookups raise ConnectionError, like an outage would.
+    """
+
+    def __init__(self, latency=0, statuses=None, default="valid", failures=0, **options):
+        self.latency = latency
+        self.statuses = statuses or {}
+        self.default = default
+        self.failures = failures
+        self.calls = []
+
+    def _answer(self, email):
+        self.calls.append(email)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Verifier unavailable")
+        return self.statuses.get(email, self.statuses.get(email_domain(email), self.default))
+
+    def status(self, email):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(email)
+
+    async def astatus(self, email):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(email)
+
+
+class EmailVerificationService:
+    """
+    Decides whether an address may register. Verdicts are cached per address,
+    domains found to be disposable are cached as a whole, and lookups for
+    pending accounts run on a worker pool instead of the request thread.
+    """
+
+    def __init__(self, verifier, workers=4, cache_size=10000, address_ttl=60 * 60 * 24,
+                 domain_ttl=60 * 60 * 24 * 7, disposable_domains=(), retries=3, retry_backoff=2):
+        self.verifier = verifier
+        self.workers = workers
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.addresses = TTLCache(max_size=cache_size, ttl=address_ttl)
+        self.domains = TTLCache(max_size=cache_size, ttl=domain_ttl)
+        self.disposable_domains = {domain.lower() for domain in disposable_domains}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        options = settings.EMAIL_VERIFICATION
+        verifier = import_string(options["VERIFIER"])(**options.get("VERIFIER_OPTIONS", {}))
+        return cls(verifier,
+                   workers=options["WORKERS"],
+                   cache_size=options["CACHE_SIZE"],
+                   address_ttl=options["ADDRESS_TTL"],
+                   domain_ttl=options["DOMAIN_TTL"],
+                   disposable_domains=options["DISPOSABLE_DOMAINS"],
+                   retries=options.get("RETRIES", 3),
+                   retry_backoff=options.get("RETRY_BACKOFF", 2))
+
+    def cached_status(self, email):
+        """Status known without leaving the process, or None."""
+        domain = email_domain(email)
+        if domain in self.disposable_domains:
+            return "disposable"
+        return self.domains.get(domain) or self.addresses.get(email.lower())
+
+    def status(self, email):
+        status = self.cached_status(email)
+        if status is None:
+            status = self.verifier.status(email)
+            self._remember(email, status)
+        return status
+
+    async def astatus(self, email):
+        """status() that awaits the verifier, or runs it on a thread if it has no astatus()."""
+        status = self.cached_status(email)
+        if status is None:
+            if hasattr(self.verifier, "astatus"):
+                status = await self.verifier.astatus(email)
+            else:
+                status = await sync_to_async(self.verifier.status, thread_sensitive=False)(email)
+            self._remember(email, status)
+        return status
+
+    def _remember(self, email, status):
+        self.addresses.set(email.lower(), status)
+        if status == "disposable":
+            self.domains.set(email_domain(email), status)
+
+    def is_valid(self, email):
+        return self.status(email) not in REJECTED_STATUSES
+
+    def is_known_invalid(self, email):
+        return self.cached_status(email) in REJECTED_STATUSES
+
+    def verify_in_background(self, user_id, email):
+        if not self.workers:
+            self._verify_user(user_id, email)
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="email-verification")
+        return self._executor.submit(self._verify_user, user_id, email, close_connection=True)
+
+    def verify_user(self, user_id, email):
+        """
+        Settle a pending account as verified or rejected. A failing verifier is
+        asked again `retries` times, `retry_backoff` seconds later and twice as
+        long after every further failure, before the error is raised.
+        """
+        from user.authentication import forget_user
+        from user.models import EMAIL_REJECTED, EMAIL_VERIFIED, User
+        for attempt in range(self.retries + 1):
+            try:
+                valid = self.is_valid(email)
+                break
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                logger.warning("Email verification of user %s failed, retrying", user_id, exc_info=True)
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        if valid:
+            User.objects.filter(pk=user_id).update(email_status=EMAIL_VERIFIED)
+        else:
+            User.objects.filter(pk=user_id).update(email_status=EMAIL_REJECTED, is_active=False)
+        # update() sends no post_save.
+        forget_user(user_id)
+
+    def _verify_user(self, user_id, email, close_connection=False):
+        try:
+            self.verify_user(user_id, email)
+        except Exception:
+            # The account stays pending, `manage.py reverify_pending_emails` tries it again.
+            logger.exception("Email verification failed for user %s", user_id)
+        finally:
+            if close_connection:
+                connection.close()
+
+
+_service = None
+
+
+def get_verification_service():
+    global _service
+    if _service is None:
+        _service = EmailVerificationService.from_settings()
+    return _service
+
+
+@receiver(setting_changed)
+def reset_verification_service(setting=None, **kwargs):
+    global _service
+    if setting in (None, "EMAIL_VERIFICATION"):
+        _service = None
@@ -0,0 +1,107 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+
+class IngredientIndex:
+    """
+    In-process prefix index of ingredient names. Names are kept case-folded in a
+    sorted list, so a prefix is a contiguous range found by binary search, and
+    matches are ranked by how many recipes use the ingredient.
+    """
+
+    def __init__(self, refresh_interval=None, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._keys = []
+        self._ingredients = {}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def load(self, rows):
+        """Replace the index with `(id, name, usage_count)` rows."""
+        ingredients = {pk: (name, usage) for pk, name, usage in rows}
+        keys = sorted((name.casefold(), pk) for pk, (name, _) in ingredients.items())
+        with self._lock:
+            self._ingredients, self._keys = ingredients, keys
+            self._loaded_at = self.clock()
+
+    def is_stale(self):
+        if not self.loaded:
+            return True
+        return self.refresh_interval is not None and self.clock() - self._loaded_at > self.refresh_interval
+
+    def add(self, pk, name, usage=None):
+        """Insert or rename an ingredient, keeping its known usage unless `usage` is given."""
+        with self._lock:
+            if pk in self._ingredients:
+                if usage is None:
+                    usage = self._ingredients[pk][1]
+                self.remove(pk)
+            self._ingredients[pk] = (name, usage or 0)
+            insort(self._keys, (name.casefold(), pk))
+
+    def remove(self, pk):
+        with self._lock:
+            name, _ = self._ingredients.pop(pk, (None, None))
+            if name is not None:
+                position = bisect_left(self._keys, (name.casefold(), pk))
+                del self._keys[position]
+
+    def adjust_usage(self, pk, amount):
+        with self._lock:
+            if pk in self._ingredients:
+                name, usage = self._ingredients[pk]
+                self._ingredients[pk] = (name, usage + amount)
+
+    def suggest(self, prefix, limit=10):
+        """Up to `limit` (id, name) pairs whose name starts with `prefix`, most used first."""
+        prefix = prefix.casefold()
+        with self._lock:
+            matches = []
+            for position in range(bisect_left(self._keys, (prefix,)), len(self._keys)):
+                key, pk = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                name, usage = self._ingredients[pk]
+                matches.append((-usage, key, pk, name))
+        return [(pk, name) for _, _, pk, name in heapq.nsmallest(limit, matches)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """
+    The process-wide index, loaded on first use (Django discourages queries while
+    apps are initialising) and reloaded every INGREDIENT_SUGGEST_REFRESH seconds
+    to pick up writes made by other processes.
+    """
+    global _index
+    from recipes.models import Ingredient
+
+    with _index_lock:
+        if _index is None:
+            _index = IngredientIndex(refresh_interval=settings.INGREDIENT_SUGGEST_REFRESH)
+        if _index.is_stale():
+            _index.load(Ingredient.objects.values_list("id", "name", "usage_count").iterator())
+    return _index
+
+
+def reset_ingredient_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def loaded_ingredient_index():
+    """The index if this process has built it, for incremental updates."""
+    return _index if _index is not None and _index.loaded else None
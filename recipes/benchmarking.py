@@ -0,0 +1,140 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F
+from recipes.models import Recipe, average_rating, bayesian_rating
+
+WORDS = (
+    "banana", "chocolate", "vanilla", "strawberry", "apple", "cinnamon", "honey", "almond",
+    "butter", "cream", "sugar", "flour", "egg", "milk", "yogurt", "lemon", "orange", "mint",
+    "pepper", "garlic", "onion", "tomato", "basil", "oregano", "chicken", "beef", "pork",
+    "rice", "pasta", "potato", "carrot", "spinach", "cheese", "mushroom", "ginger", "coconut",
+    "walnut", "pistachio", "caramel", "coffee", "salmon", "tuna", "shrimp", "lentil", "bean",
+)
+STYLES = ("split", "icecream", "cake", "pie", "soup", "salad", "stew", "curry", "tart", "smoothie")
+
+
+def unthrottled_rest_framework():
+    """REST_FRAMEWORK settings without throttle rates, so benchmarks measure the views, not the limits."""
+    return {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+
+
+@contextmanager
+def isolated_database(using=DEFAULT_DB_ALIAS, verbosity=0, test_name=None):
+    """
+    Run the block against a freshly migrated throwaway database, like the test
+    runner does, named `test_name` if given.
+    """
+    connection = connections[using]
+    old_name = connection.settings_dict["NAME"]
+    old_test_name = connection.settings_dict["TEST"].get("NAME")
+    if test_name is not None:
+        connection.settings_dict["TEST"]["NAME"] = test_name
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        connection.settings_dict["TEST"]["NAME"] = old_test_name
+
+
+def seed_catalog(recipes, ingredients=500, users=100, ingredients_per_recipe=(2, 8), ratings_per_recipe=(0, 5),
+                 seed=0, batch_size=10000, using=DEFAULT_DB_ALIAS):
+    """Bulk insert a synthetic catalog with raw statements; returns the generated ingredient names."""
+    rng = random.Random(seed)
+    ingredient_names = [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}" for i in range(ingredients)]
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO user_user (id, password, email, first_name, last_name, created_at, is_active, is_admin, "
+            "                       email_status) "
+            "VALUES (%s, '', %s, 'Bench', 'User', CURRENT_TIMESTAMP, %s, %s, 'verified')",
+            [(i, f"bench{i}@example.com", True, False) for i in range(1, users + 1)],
+        )
+        cursor.executemany(
+            "INSERT INTO recipes_ingredient (id, name, usage_count) VALUES (%s, %s, 0)",
+            list(enumerate(ingredient_names, start=1)),
+        )
+        for start in range(1, recipes + 1, batch_size):
+            recipe_rows, link_rows, rating_rows = [], [], []
+            for recipe_id in range(start, min(start + batch_size, recipes + 1)):
+                name = f"{rng.choice(WORDS)} {rng.choice(STYLES)}"
+                text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20)))
+                author_id = rng.randint(1, users)
+                recipe_ingredients = rng.sample(range(1, ingredients + 1), rng.randint(*ingredients_per_recipe))
+                recipe_rows.append((recipe_id, author_id, name, text, len(recipe_ingredients)))
+                for ingredient_id in recipe_ingredients:
+                    link_rows.append((recipe_id, ingredient_id))
+                for user_id in rng.sample(range(1, users + 1), rng.randint(*ratings_per_recipe)):
+                    rating_rows.append((user_id, recipe_id, rng.randint(1, 5)))
+            cursor.executemany(
+                "INSERT INTO recipes_recipe (id, recipe_author_id, name, text, ingredient_count, created_at, "
+                "                            rating_count, rating_sum, rating_score) "
+                "VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, 0, 0, 0)",
+                recipe_rows,
+            )
+            cursor.executemany(
+                "INSERT INTO recipes_recipe_ingredient (recipe_id, ingredient_id) VALUES (%s, %s)",
+                link_rows,
+            )
+            cursor.executemany(
+                "INSERT INTO recipes_reciperating (user_id, recipe_id, rating, created_at) "
+                "VALUES (%s, %s, %s, CURRENT_TIMESTAMP)",
+                rating_rows,
+            )
+        cursor.execute(
+            "UPDATE recipes_ingredient SET usage_count = "
+            "(SELECT COUNT(*) FROM recipes_recipe_ingredient ri WHERE ri.ingredient_id = recipes_ingredient.id)"
+        )
+        cursor.execute(
+            "UPDATE recipes_recipe SET "
+            "rating_count = (SELECT COUNT(*) FROM recipes_reciperating rr WHERE rr.recipe_id = recipes_recipe.id), "
+            "rating_sum = (SELECT COALESCE(SUM(rating), 0) FROM recipes_reciperating rr "
+            "              WHERE rr.recipe_id = recipes_recipe.id)"
+        )
+    Recipe.objects.using(using).update(rating_score=bayesian_rating(F("rating_sum"), F("rating_count")),
+                                       rating_avg=average_rating(F("rating_sum"), F("rating_count")))
+    return ingredient_names
+
+
+def measure(func, repeat):
+    """Call `func` `repeat` times and return the sorted latencies in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(round(fraction * (len(timings) - 1))))]
+
+
+def summarize(timings):
+    return {
+        "p50": statistics.median(timings),
+        "p95": percentile(timings, 0.95),
+        "p99": percentile(timings, 0.99),
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Scenarios of `results` that are slower at p95, or issue more queries per
+    request, than `baseline` allows. Latency may grow by `tolerance` (0.2 is 20%),
+    query counts may not grow at all.
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual["p95"] > expected["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {actual['p95']:.2f}ms, baseline {expected['p95']:.2f}ms")
+        if actual["queries"] > expected["queries"] + 0.01:
+            regressions.append(f"{name}: {actual['queries']:.2f} queries/request, baseline {expected['queries']:.2f}")
+    return regressions
@@ -0,0 +1,71 @@
+import csv
+import json
+from itertools import groupby
+from operator import itemgetter
+
+from recipes.models import Recipe
+
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+CSV_COLUMNS = ("id", "author_email", "name", "text", "ingredients", "avg_rating", "rating_count")
+INGREDIENT_SEPARATOR = "|"
+
+
+def iter_recipes(queryset=None, chunk_size=2000):
+    """
+    Every recipe as a dict with its ingredient names, read with one joined query
+    whose rows are fetched `chunk_size` at a time (a server-side cursor where the
+    database has them), so memory stays flat however many recipes there are.
+    The fields match what import_recipes reads.
+    """
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    rows = queryset.order_by("id").values_list(
+        "id", "recipe_author__email", "name", "text", "rating_count", "rating_sum", "ingredient__name",
+    ).iterator(chunk_size=chunk_size)
+    for _, recipe_rows in groupby(rows, key=itemgetter(0)):
+        first = next(recipe_rows)
+        pk, author_email, name, text, rating_count, rating_sum, ingredient = first
+        ingredients = [ingredient] if ingredient is not None else []
+        ingredients += [row[6] for row in recipe_rows]
+        yield {
+            "id": pk,
+            "author_email": author_email,
+            "name": name,
+            "text": text,
+            "ingredients": ingredients,
+            "avg_rating": rating_sum / rating_count if rating_count else None,
+            "rating_count": rating_count,
+        }
+
+
+def render_ndjson(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for record in records:
+        record["ingredients"] = INGREDIENT_SEPARATOR.join(record["ingredients"])
+        yield writer.writerow(["" if record[column] is None else record[column] for column in CSV_COLUMNS])
+
+
+RENDERERS = {
+    "ndjson": render_ndjson,
+    "csv": render_csv,
+}
+
+
+def export_recipes(output_format, queryset=None, chunk_size=2000):
+    """Lines of text with every recipe in `output_format` ("ndjson" or "csv")."""
+    return RENDERERS[output_format](iter_recipes(queryset, chunk_size))
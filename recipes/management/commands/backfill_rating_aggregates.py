@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe, RecipeRating
+
+
+class Command(BaseCommand):
+    help = "Recalculate the denormalized rating_count/rating_sum/rating_score/rating_avg columns of every recipe."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Number of recipes updated per statement.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(Recipe.objects.filter(pk__gt=last_id).order_by("pk")
+                                     .values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += RecipeRating.objects.recount(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Updated rating aggregates for {updated} recipes."))
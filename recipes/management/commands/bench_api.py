@@ -0,0 +1,193 @@
+import itertools
+import json
+import random
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from backendrecipe.utils import NO_CLEARBIT_INFO
+from recipes.benchmarking import find_regressions, isolated_database, percentile, seed_catalog, summarize, unthrottled_rest_framework
+from recipes.models import Ingredient, Recipe
+from recipes.search import get_search_backend
+from user.models import User
+
+PASSWORD = "Bench-password-1"
+OFFLINE_EMAIL_VERIFICATION = {
+    'MODE': 'sync',
+    'VERIFIER': 'backendrecipe.verification.FakeVerifier',
+    'VERIFIER_OPTIONS': {},
+    'WORKERS': 0,
+    'CACHE_SIZE': 10000,
+    'ADDRESS_TTL': 60,
+    'DOMAIN_TTL': 60,
+    'DISPOSABLE_DOMAINS': [],
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database, drive every recipe and user endpoint in-process with Hunter and "
+        "Clearbit stubbed, and report latency percentiles, throughput and queries per request. "
+        "With --baseline, exit with an error when a scenario regressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=20000)
+        parser.add_argument("--ingredients", type=int, default=500)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--scenario", action="append", help="Only run these scenarios.")
+        parser.add_argument("--baseline", help="JSON file written by --output to compare against.")
+        parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 growth, 0.2 is 20%%.")
+        parser.add_argument("--output", help="Write the results as JSON, e.g. to store a new baseline.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        setup_test_environment()
+        try:
+            with isolated_database(), override_settings(
+                    EMAIL_VERIFICATION=OFFLINE_EMAIL_VERIFICATION, REST_FRAMEWORK=unthrottled_rest_framework()), \
+                    mock.patch("backendrecipe.utils.clearbit_info", return_value=NO_CLEARBIT_INFO), \
+                    mock.patch("backendrecipe.utils.clearbit_info_async", mock.AsyncMock(return_value=NO_CLEARBIT_INFO)):
+                start = time.perf_counter()
+                seed_catalog(options["recipes"], ingredients=options["ingredients"], users=options["users"],
+                             seed=options["seed"])
+                get_search_backend().rebuild()
+                self.stdout.write(f"Seeded {options['recipes']} recipes in {time.perf_counter() - start:.1f}s")
+                results = self.run_scenarios(options)
+        finally:
+            teardown_test_environment()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        if baseline is not None:
+            regressions = find_regressions(results, baseline, options["tolerance"])
+            if regressions:
+                raise CommandError("Regressed against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write("No regressions against the baseline.")
+
+    def get_scenarios(self, options):
+        rng = random.Random(options["seed"])
+        user = User.objects.get(pk=1)
+        user.set_password(PASSWORD)
+        user.save(update_fields=["password"])
+        refresh = RefreshToken.for_user(user)
+        self.authorization = f"Bearer {refresh.access_token}"
+        refresh = str(refresh)
+        ingredient_ids = list(Ingredient.objects.values_list("pk", flat=True)[:50])
+        other_recipe_ids = list(Recipe.objects.exclude(recipe_author=user).values_list("pk", flat=True)[:1000])
+        counter = itertools.count()
+
+        def recipe(i):
+            return {"name": f"bench recipe {i}", "text": "banana cinnamon honey",
+                    "ingredient": rng.sample(ingredient_ids, 3)}
+
+        def register(i):
+            return {"email": f"bench-register-{next(counter)}@example.com", "password": PASSWORD,
+                    "password2": PASSWORD, "first_name": "Bench", "last_name": "User"}
+
+        # name: (method, url, payload factory, authenticated, expected status)
+        return {
+            "ingredients": ("get", reverse("ingredients"), None, True, 200),
+            "ingredients_create": ("post", reverse("ingredients"), lambda i: {"name": f"bench ingredient {i}"},
+                                   True, 201),
+            "ingredient_suggest": ("get", reverse("ingredient_suggest"), lambda i: {"q": "ba"}, True, 200),
+            "recipes": ("get", reverse("all_recipes"), None, True, 200),
+            "recipes_deep_page": ("get", reverse("all_recipes"), lambda i: {"page": 50}, True, 200),
+            "recipes_cursor": ("get", reverse("all_recipes"), lambda i: {"pagination": "cursor"}, True, 200),
+            "recipes_search": ("get", reverse("all_recipes"), lambda i: {"search": "chocolate cake"}, True, 200),
+            "recipes_similar": ("get", reverse("similar_recipes", kwargs={"pk": other_recipe_ids[0]}), None, True, 200),
+            "recipes_cookable": ("get", reverse("cookable_recipes"),
+                                 lambda i: {"ingredient": ",".join(map(str, rng.sample(ingredient_ids, 10)))},
+                                 True, 200),
+            "recipes_async": ("get", reverse("async_all_recipes"), None, True, 200),
+            "recipes_export": ("get", reverse("export_recipes"), None, True, 200),
+            "recipes_export_csv": ("get", reverse("export_recipes"), lambda i: {"output": "csv"}, True, 200),
+            "own_recipes": ("get", reverse("user_recipes"), None, True, 200),
+            "own_recipes_async": ("get", reverse("async_user_recipes"), None, True, 200),
+            "recipe_create": ("post", reverse("create_recipes"), recipe, True, 201),
+            "recipe_bulk_create": ("post", reverse("bulk_create_recipes"),
+                                   lambda i: [recipe(f"{i}-{n}") for n in range(10)], True, 201),
+            "rate": ("put", reverse("rate"),
+                     lambda i: {"recipe": rng.choice(other_recipe_ids), "rating": rng.randint(1, 5)}, True, 200),
+            "top_rated": ("get", reverse("top_rated_recipes"), None, True, 200),
+            "top_rated_week": ("get", reverse("top_rated_recipes"), lambda i: {"window": "week"}, True, 200),
+            "top_ingredients": ("get", reverse("top_5_most_used_ingredients"), None, True, 200),
+            "ingredient_pairs": ("get", reverse("ingredient_pairs", kwargs={"pk": ingredient_ids[0]}), None, True, 200),
+            "register": ("post", reverse("register"), register, False, 201),
+            "register_async": ("post", reverse("async_register"), register, False, 201),
+            "login": ("post", reverse("login"), lambda i: {"email": user.email, "password": PASSWORD}, False, 200),
+            "token_refresh": ("post", reverse("token_refresh"), lambda i: {"refresh": refresh}, False, 200),
+            "user_info": ("get", reverse("info", kwargs={"pk": user.pk}), None, True, 200),
+            "user_info_async": ("get", reverse("async_info", kwargs={"pk": user.pk}), None, True, 200),
+        }, user
+
+    def run_scenarios(self, options):
+        scenarios, user = self.get_scenarios(options)
+        selected = options["scenario"] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        results = {}
+        for name in selected:
+            method, url, payload, authenticated, expected = scenarios[name]
+            client = APIClient()
+            if authenticated:
+                # The async views authenticate the token themselves, force_authenticate only reaches DRF views.
+                client.force_authenticate(user=user)
+                client.credentials(HTTP_AUTHORIZATION=self.authorization)
+            request = getattr(client, method)
+
+            def call(i):
+                response = request(url, data=payload(i) if payload else None,
+                                   format=None if method == "get" else "json")
+                if response.status_code != expected:
+                    raise CommandError(f"{name}: expected {expected}, got {response.status_code}: "
+                                       f"{response.content[:200]!r}")
+                if response.streaming:
+                    # Exports are generated while the body is read.
+                    for _ in response.streaming_content:
+                        pass
+
+            for i in range(options["warmup"]):
+                call(f"warmup-{i}")
+            queries = QueryCounter()
+            timings = []
+            with connection.execute_wrapper(queries):
+                started = time.perf_counter()
+                for i in range(options["requests"]):
+                    start = time.perf_counter()
+                    call(i)
+                    timings.append((time.perf_counter() - start) * 1000)
+                elapsed = time.perf_counter() - started
+            timings.sort()
+            stats = summarize(timings)
+            results[name] = {**stats, "max": percentile(timings, 1),
+                             "rps": options["requests"] / elapsed,
+                             "queries": queries.count / options["requests"]}
+            self.stdout.write(f"{name:<20} p50={stats['p50']:8.2f}ms p95={stats['p95']:8.2f}ms "
+                              f"p99={stats['p99']:8.2f}ms {results[name]['rps']:8.1f} req/s "
+                              f"{results[name]['queries']:6.2f} queries/req")
+        return results
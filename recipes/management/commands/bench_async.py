@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from clearbit.enrichment import PersonCompany
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from backendrecipe.utils import get_clearbit_cache
+from recipes.benchmarking import isolated_database, seed_catalog, summarize, unthrottled_rest_framework
+from user.models import User
+
+PASSWORD = "Bench-password-1"
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    """Answers like Hunter's email verifier and Clearbit's combined lookup, after `latency` seconds."""
+    latency = 0.2
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if self.path.startswith("/v2/email-verifier"):
+            body = {"data": {"status": "valid"}}
+        else:
+            body = {"person": {"bio": None}, "company": None}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and async (ASGI) user info and registration views against a local fake "
+        "Hunter/Clearbit that answers after --latency seconds. The sync views run on --threads threads like "
+        "one threaded WSGI worker, the async ones on a single event loop with --concurrency requests in flight."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Requests per run.")
+        parser.add_argument("--latency", type=float, default=0.2, help="Seconds the fake upstream takes.")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--concurrency", type=int, default=100)
+
+    def handle(self, *args, **options):
+        FakeUpstreamHandler.latency = options["latency"]
+        upstream = ThreadingHTTPServer(("localhost", 0), FakeUpstreamHandler)
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        base_url = f"http://localhost:{upstream.server_address[1]}/v2"
+
+        setup_test_environment()
+        directory = tempfile.TemporaryDirectory()
+        try:
+            # The stream endpoint must have no "." for clearbit's "-stream." host rewrite to leave it alone.
+            with isolated_database(test_name=self.test_database_name(directory.name)), mock.patch.object(PersonCompany, "endpoint", f"{base_url}/combined"), \
+                    override_settings(HUNTER_API_URL=base_url, CLEARBIT_STREAM_URL=f"{base_url}/combined/find",
+                                      PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+                                      EMAIL_VERIFICATION=self.email_verification(),
+                                      REST_FRAMEWORK=unthrottled_rest_framework()):
+                seed_catalog(0, users=options["requests"])
+                self.run(options)
+        finally:
+            teardown_test_environment()
+            upstream.shutdown()
+            directory.cleanup()
+
+    def test_database_name(self, directory):
+        if connection.vendor == "sqlite":
+            # A file: threads writing to SQLite's shared in-memory database fail with "table is locked".
+            return os.path.join(directory, "bench.sqlite3")
+        return None
+
+    def email_verification(self):
+        return {**settings.EMAIL_VERIFICATION, "MODE": "sync", "WORKERS": 0,
+                "VERIFIER": "backendrecipe.verification.HunterVerifier"}
+
+    def run(self, options):
+        users = list(User.objects.order_by("pk"))
+        tokens = [f"Bearer {AccessToken.for_user(user)}" for user in users]
+
+        def info(prefix, i):
+            return "get", reverse(f"{prefix}info", kwargs={"pk": users[i].pk}), None, tokens[i]
+
+        def register(prefix, i):
+            data = {"email": f"{prefix}bench-{i}@example.com", "password": PASSWORD, "password2": PASSWORD,
+                    "first_name": "Bench", "last_name": "User"}
+            return "post", reverse(f"{prefix}register"), data, None
+
+        for name, scenario in (("user info (Clearbit)", info), ("register (Hunter)", register)):
+            for label, runner in (("WSGI", self.run_sync), ("ASGI", self.run_async)):
+                get_clearbit_cache().clear()
+                timings, elapsed = runner(scenario, options)
+                stats = summarize(sorted(timings))
+                self.stdout.write(f"{name:<22} {label} {len(timings) / elapsed:8.1f} req/s "
+                                  f"p50={stats['p50']:8.1f}ms p95={stats['p95']:8.1f}ms")
+
+    def check_response(self, response, method):
+        expected = 201 if method == "post" else 200
+        if response.status_code != expected:
+            raise CommandError(f"Expected {expected}, got {response.status_code}: {response.content[:200]!r}")
+
+    def run_sync(self, scenario, options):
+        def call(i):
+            method, url, data, token = scenario("", i)
+            client = Client(HTTP_AUTHORIZATION=token) if token else Client()
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data=data, content_type="application/json") \
+                if data else getattr(client, method)(url)
+            self.check_response(response, method)
+            return (time.perf_counter() - start) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            timings = list(executor.map(call, range(options["requests"])))
+        return timings, time.perf_counter() - started
+
+    def run_async(self, scenario, options):
+        async def call(client, semaphore, i):
+            method, url, data, token = scenario("async_", i)
+            extra = {"AUTHORIZATION": token} if token else {}
+            async with semaphore:
+                start = time.perf_counter()
+                if data:
+                    response = await getattr(client, method)(url, data, content_type="application/json", **extra)
+                else:
+                    response = await getattr(client, method)(url, **extra)
+                self.check_response(response, method)
+                return (time.perf_counter() - start) * 1000
+
+        async def main():
+            client, semaphore = AsyncClient(), asyncio.Semaphore(options["concurrency"])
+            return await asyncio.gather(*(call(client, semaphore, i) for i in range(options["requests"])))
+
+        started = time.perf_counter()
+        timings = asyncio.run(main())
+        return timings, time.perf_counter() - started
@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from recipes.benchmarking import isolated_database, measure, seed_catalog, summarize
+from recipes.models import Recipe
+from recipes.similarity import SimilarityIndex, recipe_links
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and compare answering \"what can I cook\" with an aggregate query "
+        "against the ingredient posting index, for pantries of --pantry ingredients."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000000)
+        parser.add_argument("--ingredients", type=int, default=2000)
+        parser.add_argument("--pantry", type=int, action="append", help="Pantry sizes, default 5, 20 and 100.")
+        parser.add_argument("--min-coverage", type=float, default=0.5)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        with isolated_database() as connection:
+            start = time.perf_counter()
+            seed_catalog(options["recipes"], ingredients=options["ingredients"], ratings_per_recipe=(0, 0))
+            self.stdout.write(f"Seeded {options['recipes']} recipes in {time.perf_counter() - start:.1f}s")
+            start = time.perf_counter()
+            index = SimilarityIndex()
+            index.load(recipe_links(Recipe.ingredient.through.objects.using(connection.alias)))
+            self.stdout.write(f"Loaded the posting index in {time.perf_counter() - start:.1f}s")
+
+            page_size, min_coverage = options["page_size"], options["min_coverage"]
+            for pantry in options["pantry"] or (5, 20, 100):
+                ingredient_ids = rng.sample(range(1, options["ingredients"] + 1), pantry)
+                queryset = Recipe.objects.annotate(
+                    total=Count("ingredient"), used=Count("ingredient", filter=Q(ingredient__in=ingredient_ids)),
+                ).filter(used__gt=0, used__gte=F("total") * min_coverage) \
+                 .order_by((Cast("used", FloatField()) / F("total")).desc(), "-used", "id")
+
+                def aggregate():
+                    queryset.count()
+                    list(queryset.values_list("id", "used", "total")[:page_size])
+
+                def posting_index():
+                    ranked = index.covering(ingredient_ids, min_coverage)
+                    len(ranked)
+                    list(Recipe.objects.filter(pk__in=[recipe_id for recipe_id, _, _ in ranked[:page_size]]))
+
+                for name, run in (("aggregate query", aggregate), ("posting index", posting_index)):
+                    stats = summarize(measure(run, options["repeat"]))
+                    self.stdout.write(f"{name:<16} pantry={pantry:<4} p50={stats['p50']:9.2f}ms "
+                                      f"p95={stats['p95']:9.2f}ms p99={stats['p99']:9.2f}ms")
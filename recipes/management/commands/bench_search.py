@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.benchmarking import isolated_database, measure, seed_catalog, summarize
+from recipes.models import Recipe
+from recipes.search import LikeSearchBackend, get_search_backend
+
+QUERIES = ("banana", "chocolate cake", "garlic soup", "cinnamon", "pistachio smoothie")
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway database and compare LIKE search against the indexed search backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=1000000)
+        parser.add_argument("--ingredients", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=10)
+
+    def handle(self, *args, **options):
+        with isolated_database() as connection:
+            start = time.perf_counter()
+            seed_catalog(options["recipes"], ingredients=options["ingredients"], ratings_per_recipe=(0, 0))
+            indexed = get_search_backend(connection.alias)
+            indexed.rebuild()
+            self.stdout.write(f"Seeded and indexed {options['recipes']} recipes in "
+                              f"{time.perf_counter() - start:.1f}s using {type(indexed).__name__}")
+
+            queryset = Recipe.objects.prefetch_related("ingredient").all()
+            page_size = options["page_size"]
+            for backend in (LikeSearchBackend(connection.alias), indexed):
+                for query in QUERIES:
+                    results = backend.search(queryset, query.split())
+
+                    def run():
+                        results.count()
+                        list(results[:page_size])
+
+                    stats = summarize(measure(run, options["repeat"]))
+                    self.stdout.write(
+                        f"{type(backend).__name__:<24} {query!r:<22} "
+                        f"p50={stats['p50']:9.2f}ms p95={stats['p95']:9.2f}ms p99={stats['p99']:9.2f}ms"
+                    )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from backendrecipe.renderers import FastJSONRenderer
+from recipes.benchmarking import isolated_database, measure, seed_catalog, summarize
+from recipes.models import Recipe
+from recipes.projections import RECIPE_ROW_FIELDS, recipe_rows_data
+from recipes.serializers import RecipesSerializer
+
+
+class Command(BaseCommand):
+    help = "Seed a throwaway database and compare RecipesSerializer against the projected list path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            seed_catalog(options["recipes"])
+            page_size = options["page_size"]
+            queryset = Recipe.objects.order_by("name", "id")
+
+            def serialized():
+                page = list(queryset.prefetch_related("ingredient")[:page_size])
+                return JSONRenderer().render(RecipesSerializer(page, many=True).data)
+
+            def projected():
+                page = list(queryset.values(*RECIPE_ROW_FIELDS)[:page_size])
+                return FastJSONRenderer().render(recipe_rows_data(page))
+
+            if serialized() != projected():
+                self.stderr.write("The two paths rendered different bodies.")
+            for label, func in (("serializer + JSONRenderer", serialized), ("projection + FastJSONRenderer", projected)):
+                stats = summarize(measure(func, options["repeat"]))
+                self.stdout.write(f"{label:<30} p50={stats['p50']:8.2f}ms p95={stats['p95']:8.2f}ms "
+                                  f"p99={stats['p99']:8.2f}ms")
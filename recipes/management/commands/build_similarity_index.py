@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from recipes.models import Recipe
+from recipes.similarity import SimilarityIndex, recipe_links
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the recipe similarity index from the database and write it to RECIPE_SIMILARITY_INDEX "
+        "(or --output), where the workers pick it up. Run it on a schedule to fold in changes made by "
+        "other workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--output", default=settings.RECIPE_SIMILARITY_INDEX)
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not options["output"]:
+            raise CommandError("Set RECIPE_SIMILARITY_INDEX or pass --output.")
+        start = time.perf_counter()
+        index = SimilarityIndex()
+        index.load(recipe_links(Recipe.ingredient.through.objects.using(options["database"]),
+                                options["chunk_size"]))
+        index.write(options["output"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote the similarity index of {len(index)} recipes to {options['output']} "
+            f"in {time.perf_counter() - start:.1f}s."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from recipes.exports import RENDERERS, export_recipes
+
+
+class Command(BaseCommand):
+    help = "Write every recipe with its ingredients and rating as NDJSON or CSV, in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output-format", choices=sorted(RENDERERS), default="ndjson")
+        parser.add_argument("--output", help="File to write, defaults to stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched from the database at a time.")
+
+    def handle(self, *args, **options):
+        lines = export_recipes(options["output_format"], chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from recipes.models import Ingredient, Recipe, RecipeImport
+from recipes.signals import ingredients_bulk_created, recipes_bulk_created
+from user.models import User
+
+FORMATS = ("jsonl", "csv")
+NAME_MAX_LENGTH = Recipe._meta.get_field("name").max_length
+TEXT_MAX_LENGTH = Recipe._meta.get_field("text").max_length
+INGREDIENT_MAX_LENGTH = Ingredient._meta.get_field("name").max_length
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream recipes from a JSONL or CSV file into the database in batches. Each row has "
+        "author_email, name, text and ingredients (a list in JSONL, separated by --separator in CSV). "
+        "Progress is saved with every batch, running the command again resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--separator", default="|", help="Separates ingredient names in CSV files.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Recipes written per transaction.")
+        parser.add_argument("--restart", action="store_true", help="Ignore saved progress.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format not in FORMATS:
+            raise CommandError(f"Unknown format {file_format!r}, pass --format jsonl or --format csv.")
+        using = router.db_for_write(Recipe)
+        progress, created = RecipeImport.objects.using(using).get_or_create(path=os.path.abspath(path))
+        if options["restart"]:
+            progress.rows = progress.imported = progress.skipped = 0
+        elif not created:
+            self.stdout.write(f"Resuming after row {progress.rows}.")
+
+        start, imported_at_start = time.perf_counter(), progress.imported
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = self.read_rows(f, file_format, options["separator"])
+            rows = islice(rows, progress.rows, None)
+            while True:
+                batch = list(islice(rows, options["batch_size"]))
+                if not batch:
+                    break
+                # The progress is committed with the batch, so a resumed run never writes it twice.
+                with transaction.atomic(using=using):
+                    imported = self.import_batch(batch, using)
+                    progress.rows += len(batch)
+                    progress.imported += imported
+                    progress.skipped += len(batch) - imported
+                    progress.save(using=using)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{progress.rows} rows read, {progress.imported} imported, "
+                                  f"{progress.skipped} skipped, "
+                                  f"{(progress.imported - imported_at_start) / elapsed:.0f} rows/s")
+
+        progress.delete(using=using)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {progress.imported} recipes, skipped {progress.skipped} rows."))
+
+    def read_rows(self, f, file_format, separator):
+        """(line, row) pairs; rows that can not be parsed are yielded as None."""
+        if file_format == "jsonl":
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError:
+                    yield line, None
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                ingredients = row.get("ingredients")
+                if ingredients is not None:
+                    row["ingredients"] = ingredients.split(separator)
+                yield reader.line_num, row
+
+    def clean(self, line, row):
+        if not isinstance(row, dict):
+            return self.skip(line, "not a JSON object")
+        author, name, text, ingredients = (row.get(key) for key in ("author_email", "name", "text", "ingredients"))
+        if not isinstance(author, str) or not author.strip():
+            return self.skip(line, "author_email is missing")
+        if not isinstance(name, str) or not name.strip() or len(name) > NAME_MAX_LENGTH:
+            return self.skip(line, "name is missing or too long")
+        if not isinstance(text, str) or not text.strip() or len(text) > TEXT_MAX_LENGTH:
+            return self.skip(line, "text is missing or too long")
+        if not isinstance(ingredients, list) or not all(isinstance(item, str) for item in ingredients):
+            return self.skip(line, "ingredients must be a list of names")
+        ingredients = list(dict.fromkeys(item.strip() for item in ingredients if item.strip()))
+        if not ingredients or any(len(item) > INGREDIENT_MAX_LENGTH for item in ingredients):
+            return self.skip(line, "ingredients are missing or too long")
+        return {"author_email": author.strip(), "name": name, "text": text, "ingredients": ingredients}
+
+    def skip(self, line, reason):
+        self.stderr.write(f"Skipping row on line {line}: {reason}.")
+        return None
+
+    def import_batch(self, batch, using):
+        items = [item for item in (self.clean(line, row) for line, row in batch) if item is not None]
+        authors = dict(User.objects.using(using)
+                           .filter(email__in={item["author_email"] for item in items})
+                           .values_list("email", "pk"))
+        for item in items:
+            if item["author_email"] not in authors:
+                self.stderr.write(f"Skipping recipe {item['name']!r}: no user {item['author_email']}.")
+        items = [item for item in items if item["author_email"] in authors]
+
+        names = {name for item in items for name in item["ingredients"]}
+        ingredient_ids = dict(Ingredient.objects.using(using).filter(name__in=names).values_list("name", "pk"))
+        new_ingredients = [Ingredient(name=name) for name in names if name not in ingredient_ids]
+        if new_ingredients:
+            # Another import may add the same names meanwhile, read back whatever won.
+            Ingredient.objects.using(using).bulk_create(new_ingredients, ignore_conflicts=True)
+            new_ingredients = list(Ingredient.objects.using(using)
+                                             .filter(name__in=[ingredient.name for ingredient in new_ingredients]))
+            ingredient_ids.update((ingredient.name, ingredient.pk) for ingredient in new_ingredients)
+            ingredients_bulk_created(new_ingredients, using)
+
+        RecipeIngredient = Recipe.ingredient.through
+        recipes = Recipe.objects.using(using).bulk_create([
+            Recipe(recipe_author_id=authors[item["author_email"]], name=item["name"], text=item["text"])
+            for item in items
+        ])
+        links = [(recipe.pk, ingredient_ids[name]) for recipe, item in zip(recipes, items)
+                 for name in item["ingredients"]]
+        RecipeIngredient.objects.using(using).bulk_create([
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id) for recipe_id, ingredient_id in links
+        ])
+        recipes_bulk_created([recipe.pk for recipe in recipes], links, using)
+        return len(recipes)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from recipes.models import IngredientPair, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the ingredient pairs from scratch, streaming through the recipes --batch-size at a time so "
+        "each statement joins only that batch's links."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--batch-size", type=int, default=10000, help="Number of recipes counted per statement.")
+
+    def handle(self, *args, **options):
+        using, batch_size = options["database"], options["batch_size"]
+        recipes = 0
+        # One transaction, so readers keep the old counts until the new ones are complete.
+        with transaction.atomic(using=using):
+            IngredientPair.objects.using(using).all().delete()
+            last_id = 0
+            while True:
+                ids = list(Recipe.objects.using(using).filter(pk__gt=last_id).order_by("pk")
+                                         .values_list("pk", flat=True)[:batch_size])
+                if not ids:
+                    break
+                IngredientPair.objects.add_recipes(ids[0], ids[-1], using=using)
+                recipes += len(ids)
+                last_id = ids[-1]
+        pairs = IngredientPair.objects.using(using).count()
+        self.stdout.write(self.style.SUCCESS(f"Counted {pairs} ingredient pairs in {recipes} recipes."))
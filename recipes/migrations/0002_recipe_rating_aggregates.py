@@ -0,0 +1,42 @@
+# Generated by Django 4.1 on 2026-10-18 10:21
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRating = apps.get_model('recipes', 'RecipeRating')
+    ratings = RecipeRating.objects.filter(recipe=OuterRef('pk'), rating__isnull=False).order_by().values('recipe')
+    Recipe.objects.using(schema_editor.connection.alias).update(
+        rating_count=Coalesce(Subquery(ratings.annotate(total=Count('rating')).values('total'),
+                                       output_field=IntegerField()), Value(0)),
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total'),
+                                     output_field=IntegerField()), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ['name']},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
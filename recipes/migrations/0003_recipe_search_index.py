@@ -0,0 +1,23 @@
+from django.db import migrations
+from recipes.search import get_search_backend
+
+
+def create_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection.alias)
+    backend.create_index(schema_editor)
+    backend.rebuild()
+
+
+def drop_search_index(apps, schema_editor):
+    get_search_backend(schema_editor.connection.alias).drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_recipe_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
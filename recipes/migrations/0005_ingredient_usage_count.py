@@ -0,0 +1,35 @@
+# Generated by Django 4.1 on 2026-10-18 10:26
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_usage_count(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    usage = Recipe.ingredient.through.objects.filter(ingredient=OuterRef('pk')).order_by() \
+                                             .values('ingredient').annotate(total=Count('pk')).values('total')
+    Ingredient.objects.using(schema_editor.connection.alias).update(
+        usage_count=Coalesce(Subquery(usage, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_keyset_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['-usage_count', 'name'], name='ingredient_usage_idx'),
+        ),
+        migrations.RunPython(backfill_usage_count, migrations.RunPython.noop),
+    ]
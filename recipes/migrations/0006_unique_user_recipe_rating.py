@@ -0,0 +1,36 @@
+# Generated by Django 4.1 on 2026-10-18 10:31
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def remove_duplicate_ratings(apps, schema_editor):
+    RecipeRating = apps.get_model('recipes', 'RecipeRating')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ratings = RecipeRating.objects.using(schema_editor.connection.alias)
+    duplicates = ratings.values('user', 'recipe').order_by().annotate(first_id=Min('id'), total=Count('id')) \
+                        .filter(total__gt=1)
+    for duplicate in duplicates:
+        # Keep the first vote, as the old exists() check intended.
+        ratings.filter(user=duplicate['user'], recipe=duplicate['recipe']) \
+               .exclude(id=duplicate['first_id']).delete()
+        aggregates = ratings.filter(recipe=duplicate['recipe'], rating__isnull=False) \
+                            .aggregate(rating_count=Count('rating'), rating_sum=Sum('rating'))
+        Recipe.objects.using(schema_editor.connection.alias).filter(pk=duplicate['recipe']).update(
+            rating_count=aggregates['rating_count'], rating_sum=aggregates['rating_sum'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_usage_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_ratings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reciperating',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_recipe_rating'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1 on 2026-10-18 11:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_ingredient_pairs(apps, schema_editor):
+    IngredientPair = apps.get_model('recipes', 'IngredientPair')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    quote_name = schema_editor.connection.ops.quote_name
+    table = quote_name(IngredientPair._meta.db_table)
+    links = quote_name(Recipe.ingredient.through._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (ingredient_id, other_id, recipe_count) "
+            f"SELECT a.ingredient_id, b.ingredient_id, COUNT(*) FROM {links} a "
+            f"JOIN {links} b ON b.recipe_id = a.recipe_id AND b.ingredient_id <> a.ingredient_id "
+            f"GROUP BY a.ingredient_id, b.ingredient_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_unique_user_recipe_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pairs', to='recipes.ingredient')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ingredientpair',
+            index=models.Index(fields=['ingredient', '-recipe_count', 'other'], name='ingredient_pair_top_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientpair',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'other'), name='unique_ingredient_pair'),
+        ),
+        migrations.RunPython(backfill_ingredient_pairs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1 on 2026-10-18 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+import django.utils.timezone
+import recipes.models
+
+
+def backfill_rating_score(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    weight = float(settings.RECIPE_RATING_PRIOR_WEIGHT)
+    Recipe.objects.using(schema_editor.connection.alias).update(rating_score=ExpressionWrapper(
+        (Value(weight * settings.RECIPE_RATING_PRIOR_MEAN) + F('rating_sum')) / (Value(weight) + F('rating_count')),
+        output_field=FloatField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_ingredient_pairs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_score',
+            field=models.FloatField(default=recipes.models.default_rating_score, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reciperating',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-rating_score', 'id'], name='recipe_rating_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperating',
+            index=models.Index(fields=['created_at'], name='rating_created_at_idx'),
+        ),
+        migrations.RunPython(backfill_rating_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.1 on 2026-10-18 11:45
+
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, FloatField, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+import django.utils.timezone
+
+
+def backfill_list_columns(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    links = Recipe.ingredient.through.objects.filter(recipe=OuterRef('pk')).order_by() \
+                                             .values('recipe').annotate(total=Count('pk')).values('total')
+    Recipe.objects.using(schema_editor.connection.alias).update(
+        ingredient_count=Coalesce(Subquery(links, output_field=IntegerField()), Value(0)),
+        rating_avg=ExpressionWrapper(Cast(F('rating_sum'), FloatField()) / NullIf(F('rating_count'), Value(0)),
+                                     output_field=FloatField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_rating_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_avg',
+            field=models.FloatField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['rating_avg'], name='recipe_rating_avg_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['ingredient_count', 'id'], name='recipe_ingredient_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', 'id'], name='recipe_created_at_idx'),
+        ),
+        migrations.RunPython(backfill_list_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_import'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reciperating',
+            index=models.Index(fields=['recipe', 'created_at'], name='rating_recipe_created_at_idx'),
+        ),
+    ]
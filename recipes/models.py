@@ -1,6 +1,10 @@
-from django.db import models
-from django.db.models import Avg
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
 from user.models import User
+from recipes.etags import bump_versions, feed_resource
 
 RATING_CHOICE = [
                 (1, '1'),
@@ -10,33 +14,243 @@ RATING_CHOICE = [
                 (5, '5'),
                ]
 
-class Ingredient(models.Model):
+def default_rating_score():
+    return float(settings.RECIPE_RATING_PRIOR_MEAN)
+
+def bayesian_rating(rating_sum, rating_count):
+    """
+    Expression for the average rating after adding RECIPE_RATING_PRIOR_WEIGHT
+    votes of RECIPE_RATING_PRIOR_MEAN, so a handful of votes can not outrank
+    many: a single 5 scores close to the prior mean, hundreds of 4s close to 4.
+    """
+    weight = float(settings.RECIPE_RATING_PRIOR_WEIGHT)
+    return ExpressionWrapper(
+        (Value(weight * settings.RECIPE_RATING_PRIOR_MEAN) + rating_sum) / (Value(weight) + rating_count),
+        output_field=FloatField(),
+    )
+
+def average_rating(rating_sum, rating_count):
+    """Expression for the plain average rating, NULL for recipes nobody rated."""
+    return ExpressionWrapper(Cast(rating_sum, FloatField()) / NullIf(rating_count, Value(0)),
+                             output_field=FloatField())
+
+class CounterFieldsModel(models.Model):
+    """
+    Counter columns are only ever changed with F() updates; a plain save() of a
+    stale instance must not overwrite them.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
+class Ingredient(CounterFieldsModel):
     name = models.CharField(max_length=150, unique=True)
+    usage_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ("usage_count",)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-usage_count', 'name'], name='ingredient_usage_idx'),
+        ]
 
     def __str__(self):
         return self.name    
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsModel):
     recipe_author = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=150)
     text = models.TextField(max_length=300)
     ingredient = models.ManyToManyField(Ingredient, related_name='ingredients')
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_score = models.FloatField(default=default_rating_score, editable=False)
+    rating_avg = models.FloatField(null=True, editable=False)
+    ingredient_count = models.PositiveIntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    counter_fields = ("rating_count", "rating_sum", "rating_score", "rating_avg", "ingredient_count")
 
     @property
-    def avg_rating(id):
-        average_rating = RecipeRating.objects.filter(recipe=id).aggregate(Avg("rating"))['rating__avg']
-        return average_rating
+    def avg_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
 
     class Meta:
-        ordering = ['name']
+        ordering = ['name', 'id']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='recipe_name_id_idx'),
+            models.Index(fields=['-rating_score', 'id'], name='recipe_rating_score_idx'),
+            models.Index(fields=['rating_avg'], name='recipe_rating_avg_idx'),
+            models.Index(fields=['ingredient_count', 'id'], name='recipe_ingredient_count_idx'),
+            models.Index(fields=['-created_at', 'id'], name='recipe_created_at_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+class RecipeRatingManager(models.Manager):
+
+    def rate(self, user, recipe, rating, update=False):
+        """
+        Store `user`'s rating of `recipe` with a single INSERT ... ON CONFLICT and
+        keep the recipe's rating aggregates and score in step. Returns None when the user
+        already rated the recipe and `update` is False.
+        """
+        using = router.db_for_write(self.model)
+        connection = connections[using]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        if update:
+            # created_at is when the current rating was given, the top-rated windows count it from then.
+            conflict = "DO UPDATE SET rating = excluded.rating, created_at = excluded.created_at"
+        else:
+            conflict = "DO NOTHING"
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (user_id, recipe_id, rating, created_at) VALUES (%s, %s, %s, %s) "
+                    f"ON CONFLICT (user_id, recipe_id) {conflict} RETURNING id",
+                    [user.pk, recipe.pk, rating, timezone.now()],
+                )
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            recipes = Recipe.objects.using(using).filter(pk=recipe.pk)
+            if update:
+                # The previous rating is unknown, recount this recipe's ratings.
+                self.recount([recipe.pk], using)
+            elif rating is not None:
+                # The right-hand sides all see the values from before this UPDATE.
+                recipes.update(rating_count=F("rating_count") + 1, rating_sum=F("rating_sum") + rating,
+                               rating_score=bayesian_rating(F("rating_sum") + rating, F("rating_count") + 1),
+                               rating_avg=average_rating(F("rating_sum") + rating, F("rating_count") + 1))
+            bump_versions("rating", feed_resource(recipe.recipe_author_id), using=using)
+        return self.model(pk=row[0], user=user, recipe=recipe, rating=rating)
+
+    def recount(self, recipe_ids, using=None):
+        """Recalculate the rating aggregates and score of `recipe_ids` from their ratings."""
+        ratings = self.using(using).filter(recipe=OuterRef("pk"), rating__isnull=False).order_by().values("recipe")
+        rating_count = Coalesce(Subquery(ratings.annotate(total=Count("rating")).values("total"),
+                                         output_field=models.IntegerField()), Value(0))
+        rating_sum = Coalesce(Subquery(ratings.annotate(total=Sum("rating")).values("total"),
+                                       output_field=models.IntegerField()), Value(0))
+        return Recipe.objects.using(using).filter(pk__in=recipe_ids).update(
+            rating_count=rating_count, rating_sum=rating_sum,
+            rating_score=bayesian_rating(rating_sum, rating_count),
+            rating_avg=average_rating(rating_sum, rating_count),
+        )
+
 class RecipeRating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, null=True)
     rating = models.PositiveSmallIntegerField(choices=RATING_CHOICE, null=True)
-    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = RecipeRatingManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'], name='unique_user_recipe_rating'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='rating_created_at_idx'),
+            models.Index(fields=['recipe', 'created_at'], name='rating_recipe_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return self.recipe.name
+
+class IngredientPairManager(models.Manager):
+
+    def add_counts(self, counts, using=None):
+        """
+        Add the `{(ingredient_id, other_id): amount}` of `counts`, keyed with
+        ingredient_id < other_id, to the stored pair counts both ways round,
+        inserting pairs seen for the first time and dropping those that reach 0.
+        """
+        using = using or router.db_for_write(self.model)
+        connection = connections[using]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        # Rows are written in key order, so concurrent writers lock shared pairs in the same order and can not deadlock.
+        rows = sorted(row for (first_id, second_id), amount in counts.items() if amount
+                      for row in ((first_id, second_id, amount), (second_id, first_id, amount)))
+        increments = [row for row in rows if row[2] > 0]
+        decrements = [(-amount, -amount, ingredient_id, other_id)
+                      for ingredient_id, other_id, amount in rows if amount < 0]
+        with transaction.atomic(using=using, savepoint=False):
+            with connection.cursor() as cursor:
+                if increments:
+                    cursor.executemany(
+                        f"INSERT INTO {table} (ingredient_id, other_id, recipe_count) VALUES (%s, %s, %s) "
+                        f"ON CONFLICT (ingredient_id, other_id) "
+                        f"DO UPDATE SET recipe_count = {table}.recipe_count + excluded.recipe_count",
+                        increments,
+                    )
+                if decrements:
+                    cursor.executemany(
+                        f"UPDATE {table} SET recipe_count = "
+                        f"CASE WHEN recipe_count > %s THEN recipe_count - %s ELSE 0 END "
+                        f"WHERE ingredient_id = %s AND other_id = %s",
+                        decrements,
+                    )
+            if decrements:
+                self.using(using).filter(ingredient_id__in={row[2] for row in decrements}, recipe_count=0).delete()
+
+    def add_recipes(self, first_id, last_id, using=None):
+        """Count the pairs of every recipe with an id from `first_id` to `last_id` with one INSERT ... SELECT."""
+        using = using or router.db_for_write(self.model)
+        connection = connections[using]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        links = connection.ops.quote_name(Recipe.ingredient.through._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (ingredient_id, other_id, recipe_count) "
+                f"SELECT a.ingredient_id, b.ingredient_id, COUNT(*) FROM {links} a "
+                f"JOIN {links} b ON b.recipe_id = a.recipe_id AND b.ingredient_id <> a.ingredient_id "
+                f"WHERE a.recipe_id BETWEEN %s AND %s GROUP BY a.ingredient_id, b.ingredient_id "
+                f"ON CONFLICT (ingredient_id, other_id) "
+                f"DO UPDATE SET recipe_count = {table}.recipe_count + excluded.recipe_count",
+                [first_id, last_id],
+            )
+
+class IngredientPair(models.Model):
+    """How many recipes use `ingredient` together with `other`. Every pair is stored both ways round."""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name="pairs")
+    other = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name="+")
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = IngredientPairManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ingredient', 'other'], name='unique_ingredient_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['ingredient', '-recipe_count', 'other'], name='ingredient_pair_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient_id} + {self.other_id}"
+
+class RecipeImport(models.Model):
+    """
+    Progress of an import_recipes run over the file at `path`. It is updated in
+    the transaction that writes each batch, so a resumed run never imports a
+    committed batch again.
+    """
+    path = models.CharField(max_length=1024, unique=True)
+    rows = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return self.recipe.name
\ No newline at end of file
+        return f"{self.path} ({self.rows} rows)"
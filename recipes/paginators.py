@@ -1,5 +1,168 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder cuts datetimes to milliseconds, cursors need them exact to seek past equal ones."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
 
 class CustomPagination(PageNumberPagination):
     page_size = 10
-    page_query_param = 'page'
\ No newline at end of file
+    page_query_param = 'page'
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks on the ordering columns instead of using OFFSET,
+    so every page costs the same no matter how deep it is. The total count is
+    only computed when the client asks for it with `?count=true`.
+    """
+    page_size = 10
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+    ranked_message = ('Search results are ranked by relevance and can not be paged with a cursor, '
+                      'use ?pagination=page or pass ?ordering=.')
+    ordering = None
+
+    def get_ordering(self, queryset):
+        # An explicit order_by(), e.g. from an ordering filter, wins over the model ordering.
+        ordering = list(self.ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not {'pk', 'id', '-pk', '-id'} & set(ordering):
+            ordering.append('pk')
+        return ordering
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': values, 'r': reverse}, cls=CursorJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering_fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def clean_cursor_values(self, model, values):
+        """`values` converted to the types of their ordering columns, so a tampered cursor can not break the query."""
+        opts = model._meta
+        try:
+            values = [(opts.pk if field == 'pk' else opts.get_field(field)).to_python(value)
+                      for (field, _), value in zip(self.ordering_fields, values)]
+        except (DjangoValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def seek_filter(self, values, reverse):
+        # (a, b) > (x, y) written as `a >= x AND (a > x OR (a = x AND b > y))`,
+        # the leading range keeps it an index range scan on the first column.
+        conditions = []
+        for position, (field, descending) in enumerate(self.ordering_fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            equal = {name: value for (name, _), value in zip(self.ordering_fields[:position], values)}
+            conditions.append(Q(**equal, **{f'{field}__{lookup}': values[position]}))
+        first_field, first_descending = self.ordering_fields[0]
+        leading = Q(**{f"{first_field}__{'lte' if first_descending != reverse else 'gte'}": values[0]})
+        return leading & reduce(or_, conditions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if queryset.query.extra_order_by:
+            # A relevance rank is computed per query, there is no column to seek on.
+            raise ValidationError({'pagination': self.ranked_message})
+        ordering = self.get_ordering(queryset)
+        self.ordering_fields = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        values, reverse = self.decode_cursor(request)
+        if values is not None:
+            values = self.clean_cursor_values(queryset.model, values)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.seek_filter(values, reverse))
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else values is not None
+        self.page = page
+        return page
+
+    def cursor_values(self, instance):
+        if isinstance(instance, dict):
+            # A values() row, keyed by the field names it was projected with.
+            return [instance['id' if field == 'pk' else field] for field, _ in self.ordering_fields]
+        return [getattr(instance, field) for field, _ in self.ordering_fields]
+
+    def get_link(self, instance, reverse):
+        url = self.request.build_absolute_uri()
+        if instance is None:
+            return remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(self.cursor_values(instance), reverse))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.get_link(self.page[0] if self.page else None, reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = [('next', self.get_next_link()), ('previous', self.get_previous_link()), ('results', data)]
+        if self.count is not None:
+            payload.insert(0, ('count', self.count))
+        return Response(dict(payload))
+
+class SelectablePaginationMixin:
+    """
+    Lets a list view switch between page number and keyset pagination with
+    `?pagination=page|cursor`, defaulting to the view's `pagination_class`.
+    """
+    pagination_modes = {
+        'page': CustomPagination,
+        'cursor': KeysetPagination,
+    }
+    pagination_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get(self.pagination_query_param)
+            pagination_class = self.pagination_modes.get(mode, self.pagination_class)
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
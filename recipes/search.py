@@ -0,0 +1,216 @@
+import re
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+FTS_TABLE = "recipes_recipe_fts"
+INDEX_BATCH_SIZE = 500
+
+_backends = {}
+
+
+def _chunks(ids, size=INDEX_BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class BaseSearchBackend:
+    """Keeps a search index of recipes in sync and answers `?search=` queries."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def create_index(self, schema_editor):
+        pass
+
+    def drop_index(self, schema_editor):
+        pass
+
+    def index(self, recipe_ids):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, terms):
+        raise NotImplementedError
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Unindexed `icontains` matching, equivalent to DRF's SearchFilter."""
+
+    search_fields = ("name", "text", "ingredient__name")
+
+    def search(self, queryset, terms):
+        conditions = [
+            reduce(or_, [Q(**{f"{field}__icontains": term}) for field in self.search_fields])
+            for term in terms
+        ]
+        return queryset.filter(reduce(and_, conditions)).distinct()
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """FTS5 virtual table keyed by the recipe id, ranked with bm25."""
+
+    # bm25 column weights for (name, ingredients, text).
+    weights = (10.0, 5.0, 1.0)
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(name, ingredients, text, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def index(self, recipe_ids):
+        with connections[self.using].cursor() as cursor:
+            for chunk in _chunks(recipe_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) "
+                    f"SELECT r.id, r.name, "
+                    f"       (SELECT group_concat(i.name, ' ') FROM recipes_recipe_ingredient ri "
+                    f"        JOIN recipes_ingredient i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id), "
+                    f"       r.text "
+                    f"FROM recipes_recipe r WHERE r.id IN ({placeholders})",
+                    chunk,
+                )
+
+    def remove(self, recipe_ids):
+        with connections[self.using].cursor() as cursor:
+            for chunk in _chunks(recipe_ids):
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) "
+                f"SELECT r.id, r.name, names.ingredients, r.text FROM recipes_recipe r "
+                f"LEFT JOIN (SELECT ri.recipe_id, group_concat(i.name, ' ') AS ingredients "
+                f"           FROM recipes_recipe_ingredient ri "
+                f"           JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+                f"           GROUP BY ri.recipe_id) names ON names.recipe_id = r.id"
+            )
+
+    def build_query(self, terms):
+        # Every term becomes a quoted prefix query so user input can never be
+        # parsed as FTS5 syntax.
+        return " AND ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def search(self, queryset, terms):
+        weights = ", ".join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            select={"search_rank": f"bm25({FTS_TABLE}, {weights})"},
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = recipes_recipe.id", f"{FTS_TABLE} MATCH %s"],
+            params=[self.build_query(terms)],
+            order_by=["search_rank", "name", "id"],
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector document per recipe with a GIN index, ranked with ts_rank."""
+
+    config = "simple"
+
+    def create_index(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {FTS_TABLE} ("
+            f"recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) ON DELETE CASCADE "
+            f"DEFERRABLE INITIALLY DEFERRED, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {FTS_TABLE}_document_gin ON {FTS_TABLE} USING gin (document)"
+        )
+
+    def drop_index(self, schema_editor):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def _document_sql(self, filtered):
+        inner_where, where = ("WHERE ri.recipe_id = ANY(%s)", "WHERE r.id = ANY(%s)") if filtered else ("", "")
+        return (
+            f"SELECT r.id, "
+            f"       setweight(to_tsvector('{self.config}', r.name), 'A') || "
+            f"       setweight(to_tsvector('{self.config}', coalesce(names.ingredients, '')), 'B') || "
+            f"       setweight(to_tsvector('{self.config}', r.text), 'C') "
+            f"FROM recipes_recipe r "
+            f"LEFT JOIN (SELECT ri.recipe_id, string_agg(i.name, ' ') AS ingredients "
+            f"           FROM recipes_recipe_ingredient ri "
+            f"           JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+            f"           {inner_where} "
+            f"           GROUP BY ri.recipe_id) names ON names.recipe_id = r.id "
+            f"{where}"
+        )
+
+    def index(self, recipe_ids):
+        with connections[self.using].cursor() as cursor:
+            for chunk in _chunks(recipe_ids):
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (recipe_id, document) "
+                    f"{self._document_sql(filtered=True)} "
+                    f"ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document",
+                    [chunk, chunk],
+                )
+
+    def remove(self, recipe_ids):
+        with connections[self.using].cursor() as cursor:
+            for chunk in _chunks(recipe_ids):
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE recipe_id = ANY(%s)", [chunk])
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"TRUNCATE {FTS_TABLE}")
+            cursor.execute(f"INSERT INTO {FTS_TABLE} (recipe_id, document) {self._document_sql(filtered=False)}")
+
+    def build_query(self, terms):
+        lexemes = [word for term in terms for word in re.findall(r"\w+", term)]
+        return " & ".join(f"{word}:*" for word in lexemes)
+
+    def search(self, queryset, terms):
+        query = self.build_query(terms)
+        if not query:
+            return queryset
+        return queryset.extra(
+            select={"search_rank": f"ts_rank({FTS_TABLE}.document, to_tsquery('{self.config}', %s))"},
+            select_params=[query],
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.recipe_id = recipes_recipe.id",
+                   f"{FTS_TABLE}.document @@ to_tsquery('{self.config}', %s)"],
+            params=[query],
+            order_by=["-search_rank", "name", "id"],
+        )
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTSSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend_class(using=DEFAULT_DB_ALIAS):
+    backend = getattr(settings, "RECIPE_SEARCH_BACKEND", None)
+    if backend:
+        return import_string(backend)
+    return VENDOR_BACKENDS.get(connections[using].vendor, LikeSearchBackend)
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS):
+    backend_class = get_search_backend_class(using)
+    backend = _backends.get(using)
+    if not isinstance(backend, backend_class):
+        backend = _backends[using] = backend_class(using)
+    return backend
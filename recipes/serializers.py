@@ -1,6 +1,8 @@
+from django.db import router, transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from recipes.models import Ingredient, Recipe, RecipeRating
+from recipes.models import Ingredient, IngredientPair, Recipe, RecipeRating
+from recipes.signals import recipes_bulk_created
 
 class IngredientsSerializer(serializers.ModelSerializer):
 
@@ -8,6 +10,18 @@ class IngredientsSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = ("name",)
 
+class IngredientPairSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="other_id")
+    name = serializers.CharField(source="other.name")
+
+    class Meta:
+        model = IngredientPair
+        fields = ("id", "name", "recipe_count")
+
+class IngredientSuggestionSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
 class CreateRecipesSerializer(serializers.ModelSerializer):
     recipe_author = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
@@ -15,6 +29,67 @@ class CreateRecipesSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ("recipe_author", "name", "text", "ingredient")
 
+class BulkCreateRecipesListSerializer(serializers.ListSerializer):
+    max_items = 1000
+
+    def get_ingredient_ids(self, data):
+        ids = set()
+        for item in data if isinstance(data, list) else []:
+            ingredients = item.get("ingredient") if isinstance(item, dict) else None
+            for value in ingredients if isinstance(ingredients, list) else []:
+                try:
+                    ids.add(int(value))
+                except (TypeError, ValueError):
+                    pass
+        return ids
+
+    def to_internal_value(self, data):
+        # Resolve the ingredients of every item with one query up front so each
+        # item only checks membership while it is validated.
+        self.existing_ingredient_ids = set(
+            Ingredient.objects.filter(pk__in=self.get_ingredient_ids(data)).values_list("pk", flat=True)
+        )
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        RecipeIngredient = Recipe.ingredient.through
+        recipes = [Recipe(recipe_author=item["recipe_author"], name=item["name"], text=item["text"])
+                   for item in validated_data]
+        using = router.db_for_write(Recipe)
+        with transaction.atomic(using=using):
+            Recipe.objects.using(using).bulk_create(recipes)
+            links = []
+            for recipe, item in zip(recipes, validated_data):
+                recipe.ingredient_ids = item["ingredient_ids"]
+                links += [RecipeIngredient(recipe_id=recipe.pk, ingredient_id=ingredient_id)
+                          for ingredient_id in recipe.ingredient_ids]
+            RecipeIngredient.objects.using(using).bulk_create(links)
+            recipes_bulk_created([recipe.pk for recipe in recipes],
+                                 [(link.recipe_id, link.ingredient_id) for link in links],
+                                 using)
+        return recipes
+
+class BulkCreateRecipesSerializer(serializers.ModelSerializer):
+    recipe_author = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    ingredient = serializers.ListField(child=serializers.IntegerField(), source="ingredient_ids", allow_empty=False)
+
+    class Meta:
+        model = Recipe
+        fields = ("id", "recipe_author", "name", "text", "ingredient")
+        list_serializer_class = BulkCreateRecipesListSerializer
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # ListSerializer takes max_length only as an argument, a class attribute is overwritten.
+        kwargs.setdefault("max_length", BulkCreateRecipesListSerializer.max_items)
+        return super().many_init(*args, **kwargs)
+
+    def validate_ingredient(self, value):
+        missing = [pk for pk in value if pk not in self.parent.existing_ingredient_ids]
+        if missing:
+            raise ValidationError(f'Invalid pk "{missing[0]}" - object does not exist.')
+        return list(dict.fromkeys(value))
+
 class RecipesSerializer(serializers.ModelSerializer):
     avg_rating = serializers.ReadOnlyField()
     ingredient = IngredientsSerializer(many=True)
@@ -23,6 +98,12 @@ class RecipesSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ("recipe_author", "name", "text", "ingredient", "avg_rating")
 
+class TopRatedRecipesSerializer(RecipesSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(RecipesSerializer.Meta):
+        fields = ("id",) + RecipesSerializer.Meta.fields + ("score",)
+
 class RatingSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
@@ -32,8 +113,10 @@ class RatingSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         recipe = validated_data["recipe"]
-        if recipe.recipe_author == validated_data["user"]:
+        update = validated_data.pop("update", False)
+        if recipe.recipe_author_id == validated_data["user"].pk:
             raise ValidationError("You can not rate your own recipe!")
-        if RecipeRating.objects.filter(user=validated_data["user"], recipe=validated_data["recipe"]).exists():
+        rating = RecipeRating.objects.rate(validated_data["user"], recipe, validated_data.get("rating"), update=update)
+        if rating is None:
             raise ValidationError("You already voted once!")
-        return RecipeRating.objects.create(**validated_data)
\ No newline at end of file
+        return rating
\ No newline at end of file
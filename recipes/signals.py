@@ -0,0 +1,220 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.autocomplete import loaded_ingredient_index
+from recipes.etags import bump_versions, feed_resource
+from recipes.models import Ingredient, IngredientPair, Recipe, RecipeRating
+from recipes.search import get_search_backend
+from recipes.similarity import loaded_similarity_index
+
+RecipeIngredient = Recipe.ingredient.through
+
+
+def shift_counter(model, field, uses, delta, using):
+    """Add `delta` times the `{pk: uses}` of `uses` to `field`, one UPDATE per distinct amount."""
+    by_amount = defaultdict(list)
+    for pk, count in uses.items():
+        by_amount[count * delta].append(pk)
+    for amount, pks in by_amount.items():
+        model.objects.using(using).filter(pk__in=pks).update(**{field: F(field) + amount})
+    return by_amount
+
+
+def update_ingredient_usage(links, delta, using):
+    """
+    Shift `usage_count`, `ingredient_count` and the pair counts by `delta` for
+    every (recipe_id, ingredient_id) link and patch the in-process indexes.
+    """
+    update_ingredient_pairs(links, delta, using)
+    by_amount = shift_counter(Ingredient, "usage_count", Counter(ingredient_id for _, ingredient_id in links),
+                              delta, using)
+    shift_counter(Recipe, "ingredient_count", Counter(recipe_id for recipe_id, _ in links), delta, using)
+    if links:
+        bump_versions("recipe", "ingredient_usage", using=using)
+        transaction.on_commit(lambda: _adjust_suggest_usage(by_amount), using=using)
+        transaction.on_commit(lambda: _patch_similarity_index(links, delta), using=using)
+
+
+def update_ingredient_pairs(links, delta, using):
+    """
+    Shift the counts of the ingredient pairs that adding (`delta` 1) or
+    removing (-1) the `links` makes or breaks. Works before or after the links
+    are written, the other ingredients of their recipes are read either way.
+    """
+    changed = defaultdict(set)
+    for recipe_id, ingredient_id in links:
+        changed[recipe_id].add(ingredient_id)
+    rest = defaultdict(set)
+    for recipe_id, ingredient_id in RecipeIngredient.objects.using(using).filter(recipe_id__in=list(changed)) \
+                                                    .values_list("recipe_id", "ingredient_id"):
+        if ingredient_id not in changed[recipe_id]:
+            rest[recipe_id].add(ingredient_id)
+    counts = Counter()
+    for recipe_id, ingredient_ids in changed.items():
+        ingredient_ids = sorted(ingredient_ids)
+        for position, ingredient_id in enumerate(ingredient_ids):
+            for other_id in ingredient_ids[position + 1:]:
+                counts[ingredient_id, other_id] += delta
+            for other_id in rest[recipe_id]:
+                counts[min(ingredient_id, other_id), max(ingredient_id, other_id)] += delta
+    if counts:
+        IngredientPair.objects.add_counts(counts, using)
+
+
+def _adjust_suggest_usage(by_amount):
+    index = loaded_ingredient_index()
+    if index is not None:
+        for amount, ingredient_ids in by_amount.items():
+            for ingredient_id in ingredient_ids:
+                index.adjust_usage(ingredient_id, amount)
+
+
+def _patch_similarity_index(links, delta):
+    index = loaded_similarity_index()
+    if index is not None:
+        if delta > 0:
+            index.add_links(links)
+        else:
+            index.remove_links(links)
+
+
+def bump_recipe_feeds(recipe_ids, using):
+    """Invalidate the cached feeds of the authors of `recipe_ids`."""
+    author_ids = Recipe.objects.using(using).filter(pk__in=recipe_ids) \
+                               .values_list("recipe_author_id", flat=True).distinct()
+    feeds = [feed_resource(author_id) for author_id in author_ids]
+    if feeds:
+        bump_versions(*feeds, using=using)
+
+
+def recipe_links_added(links, using):
+    """Keep derived data in sync after (recipe_id, ingredient_id) rows were inserted."""
+    recipe_ids = {recipe_id for recipe_id, _ in links}
+    get_search_backend(using).index(recipe_ids)
+    update_ingredient_usage(links, 1, using)
+    bump_recipe_feeds(recipe_ids, using)
+
+
+def recipe_links_removed(links, using):
+    """Keep derived data in sync after (recipe_id, ingredient_id) rows were deleted."""
+    recipe_ids = {recipe_id for recipe_id, _ in links}
+    get_search_backend(using).index(recipe_ids)
+    update_ingredient_usage(links, -1, using)
+    bump_recipe_feeds(recipe_ids, using)
+
+
+def recipes_bulk_created(recipe_ids, links, using):
+    """Keep derived data in sync after recipes and their links were written with bulk_create."""
+    get_search_backend(using).index(recipe_ids)
+    update_ingredient_usage(links, 1, using)
+    bump_versions("recipe", using=using)
+    bump_recipe_feeds(recipe_ids, using)
+
+
+def ingredients_bulk_created(ingredients, using):
+    """Keep derived data in sync after ingredients were written with bulk_create."""
+    if not ingredients:
+        return
+    bump_versions("ingredient", using=using)
+
+    def update_suggestions():
+        index = loaded_ingredient_index()
+        if index is not None:
+            for ingredient in ingredients:
+                index.add(ingredient.pk, ingredient.name)
+    transaction.on_commit(update_suggestions, using=using)
+
+
+def _existing_links(instance, reverse, pk_set, using):
+    links = RecipeIngredient.objects.using(using)
+    links = links.filter(ingredient=instance) if reverse else links.filter(recipe=instance)
+    if pk_set is not None:
+        links = links.filter(**{"recipe__in" if reverse else "ingredient__in": pk_set})
+    return list(links.values_list("recipe_id", "ingredient_id"))
+
+
+@receiver(m2m_changed, sender=RecipeIngredient)
+def recipe_ingredients_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action in ("pre_remove", "pre_clear"):
+        # Only links that really exist are removed, remember them before they are gone.
+        instance._removed_links = _existing_links(instance, reverse, pk_set, using)
+    elif action == "post_add":
+        links = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        recipe_links_added(links, using)
+    elif action in ("post_remove", "post_clear"):
+        recipe_links_removed(instance.__dict__.pop("_removed_links", []), using)
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, using, **kwargs):
+    get_search_backend(using).index([instance.pk])
+    bump_versions("recipe", feed_resource(instance.recipe_author_id), using=using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def release_recipe_ingredients(sender, instance, using, **kwargs):
+    # The through rows are removed by the cascade, which sends no m2m_changed.
+    update_ingredient_usage(_existing_links(instance, False, None, using), -1, using)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, using, **kwargs):
+    get_search_backend(using).remove([instance.pk])
+    bump_versions("recipe", feed_resource(instance.recipe_author_id), using=using)
+
+
+@receiver(post_save, sender=Ingredient)
+def index_renamed_ingredient(sender, instance, created, using, **kwargs):
+    if not created:
+        get_search_backend(using).index(instance.ingredients.values_list("pk", flat=True))
+    bump_versions("ingredient", using=using)
+
+    def update_suggestions():
+        index = loaded_ingredient_index()
+        if index is not None:
+            index.add(instance.pk, instance.name)
+    transaction.on_commit(update_suggestions, using=using)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def collect_ingredient_recipes(sender, instance, using, **kwargs):
+    instance._deleted_recipe_ids = list(instance.ingredients.values_list("pk", flat=True))
+    # The cascade removes the links without an m2m_changed.
+    Recipe.objects.using(using).filter(pk__in=instance._deleted_recipe_ids) \
+                  .update(ingredient_count=F("ingredient_count") - 1)
+
+
+@receiver(post_delete, sender=Ingredient)
+def index_deleted_ingredient(sender, instance, using, **kwargs):
+    get_search_backend(using).index(instance.__dict__.pop("_deleted_recipe_ids", []))
+    bump_versions("ingredient", using=using)
+
+    def update_suggestions(pk=instance.pk):
+        index = loaded_ingredient_index()
+        if index is not None:
+            index.remove(pk)
+    transaction.on_commit(update_suggestions, using=using)
+
+    def update_similarity(pk=instance.pk):
+        # The cascade removed its links without an m2m_changed.
+        index = loaded_similarity_index()
+        if index is not None:
+            index.remove_ingredient(pk)
+    transaction.on_commit(update_similarity, using=using)
+
+
+@receiver(post_save, sender=RecipeRating)
+@receiver(post_delete, sender=RecipeRating)
+def rating_changed(sender, instance, using, **kwargs):
+    bump_versions("rating", using=using)
+    bump_recipe_feeds([instance.recipe_id], using)
+
+
+@receiver(post_delete, sender=RecipeRating)
+def recount_deleted_rating(sender, instance, using, **kwargs):
+    # Also reached by the cascade when a user is deleted.
+    if instance.rating is not None:
+        RecipeRating.objects.recount([instance.recipe_id], using)
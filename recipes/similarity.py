@@ -0,0 +1,312 @@
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from heapq import nsmallest
+from math import sqrt
+
+from django.conf import settings
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+METRICS = ("jaccard", "cosine")
+
+SNAPSHOT_MAGIC = b"RSIX1"
+SNAPSHOT_HEADER = struct.Struct("<qq")
+
+
+def score(metric, overlap, size, other_size):
+    if metric == "cosine":
+        return overlap / sqrt(size * other_size)
+    return overlap / (size + other_size - overlap)
+
+
+class SimilarityIndex:
+    """
+    In-process inverted index from each ingredient to the recipes using it, for
+    ranking recipes by the ingredients they share with a set of ingredients.
+
+    Recipes are numbered with dense rows and every posting list is a sorted
+    array of rows, so only recipes sharing an ingredient are ever looked at and
+    their overlaps are counted over a handful of flat arrays (with NumPy when it
+    is installed). Overlaps are turned into Jaccard or cosine scores with the
+    number of ingredients of every recipe, which is kept per row.
+    """
+
+    def __init__(self, refresh_interval=None, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.snapshot = None
+        self._rows = {}
+        self._ids = array("q")
+        self._sizes = array("q")
+        self._postings = {}
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        return self._loaded_at is not None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def is_stale(self):
+        if not self.loaded:
+            return True
+        return self.refresh_interval is not None and self.clock() - self._loaded_at > self.refresh_interval
+
+    def load(self, links):
+        """
+        Replace the index with `(recipe_id, ingredient_id)` links, grouped by
+        recipe as recipe_links() reads them so every posting list comes out sorted.
+        """
+        rows, ids, sizes, postings = {}, array("q"), array("q"), defaultdict(lambda: array("q"))
+        for recipe_id, ingredient_id in links:
+            row = rows.get(recipe_id)
+            if row is None:
+                row = rows[recipe_id] = len(ids)
+                ids.append(recipe_id)
+                sizes.append(0)
+            postings[ingredient_id].append(row)
+            sizes[row] += 1
+        self._replace(rows, ids, sizes, dict(postings))
+
+    def _replace(self, rows, ids, sizes, postings):
+        with self._lock:
+            self._rows, self._ids, self._sizes, self._postings = rows, ids, sizes, postings
+            self._loaded_at = self.clock()
+
+    def write(self, path):
+        """Save the index to `path` for read() in other processes, replacing any previous file atomically."""
+        with self._lock:
+            temporary = f"{path}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(SNAPSHOT_MAGIC)
+                f.write(SNAPSHOT_HEADER.pack(len(self._ids), len(self._postings)))
+                self._ids.tofile(f)
+                self._sizes.tofile(f)
+                heads = array("q")
+                for ingredient_id, posting in self._postings.items():
+                    heads.extend((ingredient_id, len(posting)))
+                heads.tofile(f)
+                for posting in self._postings.values():
+                    posting.tofile(f)
+            os.replace(temporary, path)
+
+    def read(self, path):
+        """Replace the index with the one write() saved to `path` (on a machine with the same byte order)."""
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not a recipe similarity index.")
+            recipes, ingredients = SNAPSHOT_HEADER.unpack(f.read(SNAPSHOT_HEADER.size))
+            ids, sizes, heads = array("q"), array("q"), array("q")
+            ids.fromfile(f, recipes)
+            sizes.fromfile(f, recipes)
+            heads.fromfile(f, 2 * ingredients)
+            postings = {}
+            for ingredient_id, length in zip(heads[::2], heads[1::2]):
+                postings[ingredient_id] = posting = array("q")
+                posting.fromfile(f, length)
+        self._replace({recipe_id: row for row, recipe_id in enumerate(ids)}, ids, sizes, postings)
+
+    def add_links(self, links):
+        with self._lock:
+            for recipe_id, ingredient_id in links:
+                row = self._rows.get(recipe_id)
+                if row is None:
+                    row = self._rows[recipe_id] = len(self._ids)
+                    self._ids.append(recipe_id)
+                    self._sizes.append(0)
+                posting = self._postings.setdefault(ingredient_id, array("q"))
+                position = bisect_left(posting, row)
+                if position == len(posting) or posting[position] != row:
+                    posting.insert(position, row)
+                    self._sizes[row] += 1
+
+    def remove_links(self, links):
+        with self._lock:
+            for recipe_id, ingredient_id in links:
+                row, posting = self._rows.get(recipe_id), self._postings.get(ingredient_id)
+                if row is None or posting is None:
+                    continue
+                position = bisect_left(posting, row)
+                if position < len(posting) and posting[position] == row:
+                    del posting[position]
+                    self._sizes[row] -= 1
+                    if not posting:
+                        del self._postings[ingredient_id]
+
+    def remove_ingredient(self, ingredient_id):
+        with self._lock:
+            for row in self._postings.pop(ingredient_id, ()):
+                self._sizes[row] -= 1
+
+    def overlaps(self, ingredient_ids):
+        """
+        (recipe_id, number of `ingredient_ids` it uses, number of ingredients it
+        has) columns for every recipe using any of `ingredient_ids`, as NumPy
+        arrays when NumPy is installed and lists otherwise.
+        """
+        with self._lock:
+            postings = [self._postings[pk] for pk in set(ingredient_ids) if pk in self._postings]
+            if numpy is None:
+                counts = Counter()
+                for posting in postings:
+                    counts.update(posting)
+                return ([self._ids[row] for row in counts], list(counts.values()),
+                        [self._sizes[row] for row in counts])
+            if not postings:
+                empty = numpy.empty(0, dtype=numpy.int64)
+                return empty, empty, empty
+            # The buffer views are dropped before the lock is released, arrays can not grow while they exist.
+            rows, counts = numpy.unique(numpy.concatenate([numpy.frombuffer(posting, dtype=numpy.int64)
+                                                           for posting in postings]), return_counts=True)
+            return (numpy.frombuffer(self._ids, dtype=numpy.int64)[rows], counts,
+                    numpy.frombuffer(self._sizes, dtype=numpy.int64)[rows])
+
+    def similar(self, ingredient_ids, limit=10, metric="jaccard", exclude=None):
+        """
+        Up to `limit` (recipe_id, score) pairs for the recipes most similar to a
+        recipe made of `ingredient_ids`, best first and by id among equals.
+        """
+        size = len(set(ingredient_ids))
+        ids, overlaps, sizes = self.overlaps(ingredient_ids)
+        if numpy is None:
+            ranked = ((-score(metric, overlap, size, other_size), recipe_id)
+                      for recipe_id, overlap, other_size in zip(ids, overlaps, sizes) if recipe_id != exclude)
+            return [(recipe_id, -negated) for negated, recipe_id in nsmallest(limit, ranked)]
+
+        if exclude is not None:
+            keep = ids != exclude
+            ids, overlaps, sizes = ids[keep], overlaps[keep], sizes[keep]
+        if metric == "cosine":
+            scores = overlaps / numpy.sqrt(size * sizes)
+        else:
+            scores = overlaps / (size + sizes - overlaps)
+        if len(scores) > limit:
+            # Everything scoring at least the limit-th best score, ties included, then sorted.
+            threshold = numpy.partition(scores, len(scores) - limit)[len(scores) - limit]
+            keep = scores >= threshold
+            ids, scores = ids[keep], scores[keep]
+        order = numpy.lexsort((ids, -scores))[:limit]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+    def covering(self, ingredient_ids, min_coverage=0.0):
+        """
+        The recipes that have at least a `min_coverage` share of their
+        ingredients among `ingredient_ids`, as a CoverageRanking.
+        """
+        ids, overlaps, sizes = self.overlaps(ingredient_ids)
+        if numpy is None:
+            coverage = [overlap / size for overlap, size in zip(overlaps, sizes)]
+            keep = [row for row, share in enumerate(coverage) if share >= min_coverage]
+            return CoverageRanking([ids[row] for row in keep], [overlaps[row] for row in keep],
+                            [coverage[row] for row in keep])
+        coverage = overlaps / sizes
+        keep = coverage >= min_coverage
+        return CoverageRanking(ids[keep], overlaps[keep], coverage[keep])
+
+
+class CoverageRanking:
+    """
+    (recipe_id, coverage, used) for the recipes found by
+    SimilarityIndex.covering(), where `used` is how many of the ingredients a
+    recipe has. Best covered first, then those using more of the ingredients,
+    then by id.
+
+    Only the recipes up to the end of a slice are ranked when it is read, so a
+    page costs a partition of the matches and a sort of the page rather than a
+    sort of all of them.
+    """
+
+    def __init__(self, ids, overlaps, coverage):
+        self.ids, self.overlaps, self.coverage = ids, overlaps, coverage
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            position = range(len(self))[key]
+            return self[position:position + 1][0]
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            return list(self)[key]
+        if start >= stop:
+            return []
+        if numpy is None:
+            ranked = nsmallest(stop, zip(self.coverage, self.overlaps, self.ids),
+                               key=lambda row: (-row[0], -row[1], row[2]))
+            return [(recipe_id, coverage, used) for coverage, used, recipe_id in ranked[start:stop]]
+
+        ids, overlaps, coverage = self.ids, self.overlaps, self.coverage
+        if stop < len(ids):
+            # Everything covered at least as well as the stop-th best, ties included, then sorted.
+            threshold = numpy.partition(coverage, len(ids) - stop)[len(ids) - stop]
+            keep = coverage >= threshold
+            ids, overlaps, coverage = ids[keep], overlaps[keep], coverage[keep]
+        order = numpy.lexsort((ids, -overlaps, -coverage))[start:stop]
+        return list(zip(ids[order].tolist(), coverage[order].tolist(), overlaps[order].tolist()))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _snapshot_version(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_similarity_index():
+    """
+    The process-wide index. It is read from the RECIPE_SIMILARITY_INDEX file
+    written by build_similarity_index when there is one, and read again when the
+    file is replaced. Otherwise it is loaded from the database on first use and
+    every RECIPE_SIMILARITY_REFRESH seconds. Either way, links changed by this
+    process are patched in as they are committed.
+    """
+    global _index
+    from recipes.models import Recipe
+
+    path = settings.RECIPE_SIMILARITY_INDEX
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex(refresh_interval=settings.RECIPE_SIMILARITY_REFRESH)
+        version = _snapshot_version(path) if path else None
+        if version is not None:
+            if _index.snapshot != version:
+                _index.read(path)
+                _index.snapshot = version
+        elif _index.is_stale():
+            _index.load(recipe_links(Recipe.ingredient.through.objects))
+    return _index
+
+
+def recipe_links(queryset, chunk_size=10000):
+    """Every (recipe_id, ingredient_id) link of `queryset`, grouped by recipe as load() prefers."""
+    return queryset.order_by("recipe_id", "ingredient_id").values_list("recipe_id", "ingredient_id") \
+                   .iterator(chunk_size=chunk_size)
+
+
+def reset_similarity_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def loaded_similarity_index():
+    """The index if this process has built it, for incremental updates."""
+    return _index if _index is not None and _index.loaded else None
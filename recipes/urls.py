@@ -1,11 +1,20 @@
 from django.urls import path
-from .views import CreateRecipesView, IngredientsView, ListAllRecipesView, ListOwnRecipesView, RecipeRatingView, MostUsedIngredientsView
+from .views import CreateRecipesView, BulkCreateRecipesView, IngredientsView, IngredientSuggestView, ListAllRecipesView, ListOwnRecipesView, RecipeRatingView, MostUsedIngredientsView, ExportRecipesView, AsyncListAllRecipesView, AsyncListOwnRecipesView, SimilarRecipesView, CookableRecipesView, IngredientPairsView, TopRatedRecipesView
 
 urlpatterns = [
     path("ingredients/", IngredientsView.as_view(), name="ingredients"),
+    path("ingredients/suggest/", IngredientSuggestView.as_view(), name="ingredient_suggest"),
+    path("ingredients/<int:pk>/pairs/", IngredientPairsView.as_view(), name="ingredient_pairs"),
     path("", ListAllRecipesView.as_view(), name="all_recipes"),
     path("user/", ListOwnRecipesView.as_view(), name="user_recipes"),
+    path("async/", AsyncListAllRecipesView.as_view(), name="async_all_recipes"),
+    path("async/user/", AsyncListOwnRecipesView.as_view(), name="async_user_recipes"),
     path("create/", CreateRecipesView.as_view(), name="create_recipes"),
+    path("create/bulk/", BulkCreateRecipesView.as_view(), name="bulk_create_recipes"),
     path("rate/", RecipeRatingView.as_view(), name="rate"),
+    path("top-rated/", TopRatedRecipesView.as_view(), name="top_rated_recipes"),
+    path("export/", ExportRecipesView.as_view(), name="export_recipes"),
+    path("cookable/", CookableRecipesView.as_view(), name="cookable_recipes"),
+    path("<int:pk>/similar/", SimilarRecipesView.as_view(), name="similar_recipes"),
     path("top-5-ingredients/", MostUsedIngredientsView.as_view(), name="top_5_most_used_ingredients")
 ]
\ No newline at end of file
@@ -1,52 +1,291 @@
-from rest_framework import generics, filters, mixins
+from datetime import timedelta
+
+from django.db.models import Count, F, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import generics, mixins, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .serializers import IngredientsSerializer, RecipesSerializer, CreateRecipesSerializer, RatingSerializer
-from .models import Ingredient, RecipeRating, Recipe
-from .paginators import CustomPagination
-from django.db.models import Count
+from backendrecipe.async_views import AsyncAPIView
+from backendrecipe.routers import ReplicaReadMixin
+from .serializers import IngredientsSerializer, IngredientPairSerializer, IngredientSuggestionSerializer, RecipesSerializer, CreateRecipesSerializer, RatingSerializer, BulkCreateRecipesSerializer, TopRatedRecipesSerializer
+from .models import Ingredient, IngredientPair, RecipeRating, Recipe, bayesian_rating
+from .paginators import CustomPagination, SelectablePaginationMixin
+from .filters import RecipeFilterBackend, RecipeOrderingFilter, RecipeSearchFilter
+from .autocomplete import get_ingredient_index
+from .etags import CachedListMixin, ETagListMixin, feed_resource
+from .projections import RECIPE_ROW_FIELDS, ProjectedRecipeListMixin, arecipe_page, recipe_rows_data
+from .search import get_search_backend
+from .exports import EXPORT_CONTENT_TYPES, export_recipes
+from .similarity import METRICS as SIMILARITY_METRICS, get_similarity_index
 
-class IngredientsView(generics.ListCreateAPIView):
-    queryset = Ingredient.objects.all()
+class LimitMixin:
+    """Reads a bounded `?limit=` for views that return the top N rows."""
+    limit_query_param = "limit"
+    default_limit = 10
+    max_limit = 100
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+class IngredientsView(ReplicaReadMixin, ETagListMixin, generics.ListCreateAPIView):
+    queryset = Ingredient.objects.order_by("name")
     serializer_class = IngredientsSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+    etag_resources = ("ingredient",)
+    throttle_scope = "ingredient"
+    throttle_methods = ("POST",)
+
+class IngredientSuggestView(LimitMixin, generics.GenericAPIView):
+    serializer_class = IngredientSuggestionSerializer
+    permission_classes = [IsAuthenticated]
+    query_param = "q"
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.query_params.get(self.query_param, "").strip()
+        suggestions = get_ingredient_index().suggest(prefix, self.get_limit()) if prefix else []
+        serializer = self.get_serializer([{"id": pk, "name": name} for pk, name in suggestions], many=True)
+        return Response(serializer.data)
 
 class CreateRecipesView(generics.CreateAPIView):
     queryset = Recipe.objects.select_related("recipe_author").prefetch_related("ingredient").all()
     serializer_class = CreateRecipesSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = "create"
+
+class BulkCreateRecipesView(generics.CreateAPIView):
+    queryset = Recipe.objects.all()
+    serializer_class = BulkCreateRecipesSerializer
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "bulk_create"
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs["many"] = True
+        return super().get_serializer(*args, **kwargs)
 
-class ListAllRecipesView(generics.ListAPIView):
+class ListAllRecipesView(ReplicaReadMixin, ETagListMixin, ProjectedRecipeListMixin, SelectablePaginationMixin, generics.ListAPIView):
     queryset = Recipe.objects.prefetch_related("ingredient").all()
     serializer_class = RecipesSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ["name", "text", "ingredient__name"]
+    filter_backends = [RecipeFilterBackend, RecipeSearchFilter, RecipeOrderingFilter]
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
+    etag_resources = ("recipe", "ingredient", "rating")
 
-class ListOwnRecipesView(generics.GenericAPIView, mixins.ListModelMixin):
+class ListOwnRecipesView(CachedListMixin, ProjectedRecipeListMixin, SelectablePaginationMixin, generics.GenericAPIView, mixins.ListModelMixin):
     queryset = Recipe.objects.prefetch_related("ingredient").all()
     serializer_class = RecipesSerializer
+    filter_backends = [RecipeFilterBackend, RecipeOrderingFilter]
     permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+
+    def get_etag_resources(self):
+        return (feed_resource(self.request.user.id), "ingredient")
 
     def get_queryset(self):
-        queryset = Recipe.objects.filter(recipe_author=self.request.user.id)
-        return queryset
+        return super().get_queryset().filter(recipe_author=self.request.user.id)
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
+class AsyncListAllRecipesView(AsyncAPIView):
+    """ListAllRecipesView (page numbers and search) on the async ORM."""
+    page_size = CustomPagination.page_size
+    search_param = "search"
+
+    def get_queryset(self, request):
+        queryset = Recipe.objects.all()
+        terms = request.GET.get(self.search_param, "").replace("\x00", "").replace(",", " ").split()
+        if terms:
+            queryset = get_search_backend(queryset.db).search(queryset, terms)
+        return queryset
+
+    async def get(self, request, *args, **kwargs):
+        return self.render(await arecipe_page(request, self.get_queryset(request), self.page_size))
+
+class AsyncListOwnRecipesView(AsyncListAllRecipesView):
+
+    def get_queryset(self, request):
+        return Recipe.objects.filter(recipe_author=request.user.id)
+
 class RecipeRatingView(generics.CreateAPIView):
     queryset = RecipeRating.objects.select_related("user").all()
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = "rate"
+
+    def put(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(update=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class TopRatedRecipesView(ReplicaReadMixin, generics.ListAPIView):
+    """
+    Recipes by their Bayesian rating_score, best first, read in index order.
+    `?window=day|week|month` ranks by the ratings given in that period instead,
+    aggregated from the ratings' (recipe, created_at) index.
+    """
+    serializer_class = TopRatedRecipesSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+    window_query_param = "window"
+    windows = {
+        "day": timedelta(days=1),
+        "week": timedelta(weeks=1),
+        "month": timedelta(days=30),
+    }
+
+    def get_window(self):
+        window = self.request.query_params.get(self.window_query_param)
+        if window is not None and window not in self.windows:
+            raise ValidationError({self.window_query_param: f"Choose one of {', '.join(self.windows)}."})
+        return self.windows.get(window)
 
-class MostUsedIngredientsView(generics.GenericAPIView, mixins.ListModelMixin):
+    def get_queryset(self):
+        queryset = Recipe.objects.prefetch_related("ingredient")
+        window = self.get_window()
+        if window is None:
+            return queryset.annotate(score=F("rating_score")).order_by("-rating_score", "id")
+        # Filtering before annotating limits the aggregates to the ratings in the window.
+        # The windows slide, so they are summed on read rather than kept as counters.
+        return queryset.filter(reciperating__created_at__gte=timezone.now() - window,
+                               reciperating__rating__isnull=False) \
+                       .annotate(window_count=Count("reciperating"), window_sum=Sum("reciperating__rating")) \
+                       .annotate(score=bayesian_rating(F("window_sum"), F("window_count"))).order_by("-score", "id")
+
+class MostUsedIngredientsView(ReplicaReadMixin, LimitMixin, ETagListMixin, generics.GenericAPIView, mixins.ListModelMixin):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = [IsAuthenticated]
+    etag_resources = ("ingredient", "ingredient_usage")
+    default_limit = 5
 
     def get_queryset(self):
-        return Ingredient.objects.all().annotate(top_5_used_ingredients=Count("ingredients")).order_by("-top_5_used_ingredients")[:5]
-    
+        return Ingredient.objects.order_by("-usage_count", "name")[:self.get_limit()]
+
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
+
+class IngredientPairsView(ReplicaReadMixin, LimitMixin, ETagListMixin, generics.GenericAPIView, mixins.ListModelMixin):
+    """The ingredients most often used together with ingredient `pk`, with the number of recipes using both."""
+    serializer_class = IngredientPairSerializer
+    permission_classes = [IsAuthenticated]
+    etag_resources = ("ingredient", "ingredient_usage")
+
+    def get_queryset(self):
+        return IngredientPair.objects.filter(ingredient=self.kwargs["pk"]).select_related("other") \
+                                     .order_by("-recipe_count", "other")[:self.get_limit()]
+
+    def get(self, request, *args, **kwargs):
+        if not Ingredient.objects.filter(pk=kwargs["pk"]).exists():
+            raise NotFound()
+        return self.list(request, *args, **kwargs)
+
+class ExportRecipesView(ReplicaReadMixin, generics.GenericAPIView):
+    """Streams every recipe as NDJSON or CSV, chosen with `?output=` (`format` is taken by DRF)."""
+    queryset = Recipe.objects.all()
+    permission_classes = [IsAuthenticated]
+    output_query_param = "output"
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get(self.output_query_param, "ndjson")
+        if output not in EXPORT_CONTENT_TYPES:
+            raise ValidationError({self.output_query_param: f"Choose one of {', '.join(EXPORT_CONTENT_TYPES)}."})
+        # The stream is read after the view returns and the replica it picked is reset, so the alias is fixed now.
+        queryset = self.get_queryset()
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(export_recipes(output, queryset, self.chunk_size),
+                                         content_type=EXPORT_CONTENT_TYPES[output])
+        response["Content-Disposition"] = f'attachment; filename="recipes.{output}"'
+        return response
+
+class SimilarRecipesView(ReplicaReadMixin, LimitMixin, generics.GenericAPIView):
+    """
+    The recipes sharing the most ingredients with recipe `pk`, ranked by the
+    similarity index with `?metric=` jaccard (default) or cosine.
+    """
+    queryset = Recipe.objects.all()
+    permission_classes = [IsAuthenticated]
+    metric_query_param = "metric"
+
+    def get(self, request, pk, *args, **kwargs):
+        metric = request.query_params.get(self.metric_query_param, SIMILARITY_METRICS[0])
+        if metric not in SIMILARITY_METRICS:
+            raise ValidationError({self.metric_query_param: f"Choose one of {', '.join(SIMILARITY_METRICS)}."})
+        queryset = self.get_queryset()
+        ingredient_ids = list(Recipe.ingredient.through.objects.filter(recipe_id=pk)
+                              .values_list("ingredient_id", flat=True))
+        if not ingredient_ids and not queryset.filter(pk=pk).exists():
+            raise NotFound()
+
+        ranked = get_similarity_index().similar(ingredient_ids, self.get_limit(), metric, exclude=pk)
+        rows = {row["id"]: row for row in queryset.filter(pk__in=[recipe_id for recipe_id, _ in ranked])
+                                                  .values(*RECIPE_ROW_FIELDS)}
+        # Recipes deleted by other processes stay in the index until it is reloaded.
+        ranked = [(rows[recipe_id], similarity) for recipe_id, similarity in ranked if recipe_id in rows]
+        data = recipe_rows_data([row for row, _ in ranked], queryset.db)
+        return Response([{"id": row["id"], **item, "similarity": similarity}
+                         for item, (row, similarity) in zip(data, ranked)])
+
+class CookableRecipesView(ReplicaReadMixin, generics.GenericAPIView):
+    """
+    "What can I cook": the recipes with at least `?min_coverage=` of their
+    ingredients among the `?ingredient=` ids given (repeated or comma
+    separated), best covered first, with the ingredients still missing.
+    """
+    queryset = Recipe.objects.all()
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+    ingredient_query_param = "ingredient"
+    min_coverage_query_param = "min_coverage"
+    default_min_coverage = 0.5
+    max_ingredients = 200
+
+    def get_ingredient_ids(self):
+        values = [value for param in self.request.query_params.getlist(self.ingredient_query_param)
+                  for value in param.split(",") if value.strip()]
+        try:
+            ingredient_ids = {int(value) for value in values}
+        except ValueError:
+            raise ValidationError({self.ingredient_query_param: "Pass ingredient ids."})
+        if not ingredient_ids:
+            raise ValidationError({self.ingredient_query_param: "Pass at least one ingredient id."})
+        if len(ingredient_ids) > self.max_ingredients:
+            raise ValidationError({self.ingredient_query_param: f"Pass at most {self.max_ingredients} ingredients."})
+        return ingredient_ids
+
+    def get_min_coverage(self):
+        try:
+            min_coverage = float(self.request.query_params.get(self.min_coverage_query_param,
+                                                               self.default_min_coverage))
+        except ValueError:
+            min_coverage = None
+        if min_coverage is None or not 0 < min_coverage <= 1:
+            raise ValidationError({self.min_coverage_query_param: "Pass a number above 0 and at most 1."})
+        return min_coverage
+
+    def get(self, request, *args, **kwargs):
+        ingredient_ids = self.get_ingredient_ids()
+        ranked = get_similarity_index().covering(ingredient_ids, self.get_min_coverage())
+        page = self.paginate_queryset(ranked)
+        queryset = self.get_queryset()
+        rows = {row["id"]: row for row in queryset.filter(pk__in=[recipe_id for recipe_id, _, _ in page])
+                                                  .values(*RECIPE_ROW_FIELDS)}
+        # Recipes deleted by other processes stay in the index until it is reloaded.
+        page = [(rows[recipe_id], coverage) for recipe_id, coverage, _ in page if recipe_id in rows]
+        have = set(Ingredient.objects.filter(pk__in=ingredient_ids).values_list("name", flat=True))
+        data = recipe_rows_data([row for row, _ in page], queryset.db)
+        return self.get_paginated_response([
+            {"id": row["id"], **item, "coverage": coverage,
+             "missing": [ingredient["name"] for ingredient in item["ingredient"] if ingredient["name"] not in have]}
+            for item, (row, coverage) in zip(data, page)
+        ])
@@ -0,0 +1,93 @@
+import threading
+from unittest import mock
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.urls import reverse
+from backendrecipe.caches import TTLCache
+from backendrecipe.utils import NO_CLEARBIT_INFO, get_clearbit_cache
+from user.models import User
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+class TTLCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.loads = []
+
+    def loader(self, key):
+        self.loads.append(key)
+        return None if key.startswith("missing") else key.upper()
+
+    def make_cache(self, **kwargs):
+        options = dict(max_size=2, ttl=10, negative_ttl=5, is_negative=lambda value: value is None, clock=self.clock)
+        options.update(kwargs)
+        return TTLCache(**options)
+
+    def test_values_are_loaded_once_until_they_expire(self):
+        cache = self.make_cache()
+        self.assertEqual(cache.get_or_load("a", self.loader), "A")
+        self.assertEqual(cache.get_or_load("a", self.loader), "A")
+        self.clock.now = 10
+        self.assertEqual(cache.get_or_load("a", self.loader), "A")
+        self.assertEqual(self.loads, ["a", "a"])
+
+    def test_negative_results_use_their_own_ttl(self):
+        cache = self.make_cache()
+        cache.get_or_load("missing", self.loader)
+        cache.get_or_load("missing", self.loader)
+        self.clock.now = 5
+        cache.get_or_load("missing", self.loader)
+        self.assertEqual(self.loads, ["missing", "missing"])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = self.make_cache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+        self.assertEqual(len(cache), 2)
+
+    def test_stale_value_is_served_while_refreshing(self):
+        cache = self.make_cache(stale_ttl=100)
+        refreshed = threading.Event()
+
+        def slow_loader(key):
+            refreshed.wait(5)
+            return "new"
+
+        cache.set("a", "old")
+        self.clock.now = 50
+        self.assertEqual(cache.get_or_load("a", slow_loader), "old")
+        self.assertEqual(cache.get_or_load("a", slow_loader), "old")
+        refreshed.set()
+        cache._executor.shutdown(wait=True)
+        self.assertEqual(cache.get("a"), "new")
+
+    def test_entries_past_the_stale_window_are_reloaded(self):
+        cache = self.make_cache(stale_ttl=100)
+        cache.set("a", "old")
+        self.clock.now = 110
+        self.assertEqual(cache.get_or_load("a", self.loader), "A")
+
+class ClearbitCacheTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="Test@gmail.com", first_name="Nikola", last_name="Anovic")
+        self.client.force_authenticate(user=self.user)
+        get_clearbit_cache().clear()
+        self.addCleanup(get_clearbit_cache().clear)
+
+    @mock.patch("backendrecipe.utils.clearbit_info", return_value=NO_CLEARBIT_INFO)
+    def test_user_info_enrichment_is_cached(self, clearbit_info):
+        for _ in range(3):
+            response = self.client.get(reverse('info', kwargs={"pk": self.user.id}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()["clear_bit"], NO_CLEARBIT_INFO)
+
+        clearbit_info.assert_called_once_with("test@gmail.com")
@@ -1,8 +1,36 @@
+import csv
+import json
+import os
+import tempfile
+from io import StringIO
+from datetime import timedelta
+from unittest import mock
+import numpy
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 from django.urls import reverse
+from django.utils import timezone
 from user.models import User
-from recipes.models import Recipe, RecipeRating, Ingredient
+from recipes.models import Recipe, RecipeRating, RecipeImport, Ingredient, IngredientPair
+from recipes.autocomplete import reset_ingredient_index
+from recipes.benchmarking import find_regressions
+from recipes.similarity import get_similarity_index, reset_similarity_index
+from recipes.paginators import CustomPagination, KeysetPagination
+from recipes.views import ListAllRecipesView
+from backendrecipe.metrics import registry, track_outbound
+from backendrecipe.routers import PrimaryReplicaRouter
+from backendrecipe.throttling import SlidingWindowThrottle
+from backendrecipe.caches import TTLCache
+from backendrecipe.utils import NO_CLEARBIT_INFO, clearbit_info_async, get_clearbit_cache, is_clearbit_pending
+from backendrecipe.verification import get_verification_service, reset_verification_service
 
 class UserLogInViewTest(APITestCase):
     def setUp(self):
@@ -262,6 +290,7 @@ class CreateRecipesViewTest(APITestCase):
 
 class ListOwnRecipesViewTest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create(email="test@gmail.com")
         self.user.set_password("test")
         self.user.save()
@@ -287,11 +316,14 @@ class ListOwnRecipesViewTest(APITestCase):
         response = self.client.get(reverse('user_recipes'))
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json(), [{'avg_rating': None,
-                                            'ingredient': [{'name': 'ingredient 1'}],
-                                            'name': 'banana recipe',
-                                            'recipe_author': 1,
-                                            'text': 'Ovo je banana recept'}])
+        self.assertEqual(response.json(), {'count': 1,
+                                           'next': None,
+                                           'previous': None,
+                                           'results': [{'avg_rating': None,
+                                                        'ingredient': [{'name': 'ingredient 1'}],
+                                                        'name': 'banana recipe',
+                                                        'recipe_author': 1,
+                                                        'text': 'Ovo je banana recept'}]})
 
     def test_list_another_users_recipes(self):
         self.client.force_authenticate(user=self.otherUser)
@@ -299,7 +331,7 @@ class ListOwnRecipesViewTest(APITestCase):
         response = self.client.get(reverse('user_recipes'))
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json(), [])
+        self.assertEqual(response.json()['results'], [])
 
 class RecipeRatingViewTest(APITestCase):
     def setUp(self):
@@ -344,8 +376,42 @@ class RecipeRatingViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.json(), ['You can not rate your own recipe!'])
 
+    def test_rating_updates_recipe_aggregates(self):
+        thirdUser = User.objects.create(email="test3@gmail.com")
+        self.client.force_authenticate(user=self.otherUser)
+        self.client.post(reverse('rate'), data={"recipe": self.recipe1.id, "rating": 3})
+        self.client.force_authenticate(user=thirdUser)
+        self.client.post(reverse('rate'), data={"recipe": self.recipe1.id, "rating": 4})
+
+        self.recipe1.refresh_from_db()
+        self.assertEqual(self.recipe1.rating_count, 2)
+        self.assertEqual(self.recipe1.rating_sum, 7)
+        self.assertEqual(self.recipe1.avg_rating, 3.5)
+
+    def test_rate_recipe_twice(self):
+        self.client.force_authenticate(user=self.otherUser)
+        self.client.post(reverse('rate'), data={"recipe": self.recipe1.id, "rating": 3})
+        response = self.client.post(reverse('rate'), data={"recipe": self.recipe1.id, "rating": 5})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), ['You already voted once!'])
+        self.recipe1.refresh_from_db()
+        self.assertEqual((self.recipe1.rating_count, self.recipe1.rating_sum), (1, 3))
+
+    def test_backfill_rating_aggregates(self):
+        RecipeRating.objects.create(user=self.otherUser, recipe=self.recipe1, rating=2)
+        RecipeRating.objects.create(user=self.user, recipe=self.recipe2, rating=5)
+
+        call_command('backfill_rating_aggregates', stdout=StringIO())
+
+        self.recipe1.refresh_from_db()
+        self.recipe2.refresh_from_db()
+        self.assertEqual(self.recipe1.avg_rating, 2)
+        self.assertEqual(self.recipe2.avg_rating, 5)
+
 class IngredientsViewTest(APITestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create(email="test@gmail.com")
         self.user.set_password("test")
         self.user.save()
@@ -359,8 +425,11 @@ class IngredientsViewTest(APITestCase):
         response = self.client.get(reverse('ingredients'))
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.json(), [{'name': 'ingredient 1'}, 
-                                           {'name': 'ingredient 2'}])
+        self.assertEqual(response.json(), {'count': 2,
+                                           'next': None,
+                                           'previous': None,
+                                           'results': [{'name': 'ingredient 1'},
+                                                       {'name': 'ingredient 2'}]})
 
     def test_creating_ingredients(self):
         response = self.client.post(reverse('ingredients'), data={"name": "banana"})
@@ -405,4 +474,1303 @@ class MostUsedIngredientsViewTest(APITestCase):
                                            {'name': 'ingredient 6'},
                                            {'name': 'ingredient 2'},
                                            {'name': 'ingredient 3'},
-                                           {'name': 'ingredient 4'}])
\ No newline at end of file
+                                           {'name': 'ingredient 4'}])
+
+class RecipeSearchTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.user.set_password("test")
+        self.user.save()
+
+        self.banana = Ingredient.objects.create(name="banana")
+        self.cream = Ingredient.objects.create(name="cream")
+
+        self.recipe1 = Recipe.objects.create(
+            recipe_author = self.user,
+            name = "ice cream recipe",
+            text = "Ovo je recept za sladoled sa bananom",
+        )
+        self.recipe2 = Recipe.objects.create(
+            recipe_author = self.user,
+            name = "banana split",
+            text = "Ovo je banana split",
+        )
+        self.recipe1.ingredient.add(self.cream.id)
+        self.recipe2.ingredient.add(self.banana.id, self.cream.id)
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, term):
+        response = self.client.get(reverse('all_recipes'), data={"search": term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe["name"] for recipe in response.json()["results"]]
+
+    def test_search_by_name_and_ingredient(self):
+        self.assertEqual(self.search("banana"), ["banana split"])
+        self.assertEqual(self.search("cream"), ["ice cream recipe", "banana split"])
+
+    def test_search_by_prefix_of_every_term(self):
+        self.assertEqual(self.search("ban spl"), ["banana split"])
+        self.assertEqual(self.search("banana sladoled"), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('"banana OR'), [])
+
+    def test_index_follows_ingredient_changes(self):
+        self.recipe1.ingredient.add(self.banana.id)
+        self.assertEqual(self.search("banana"), ["banana split", "ice cream recipe"])
+
+        self.banana.name = "plantain"
+        self.banana.save()
+        self.assertEqual(self.search("plantain"), ["banana split", "ice cream recipe"])
+
+        self.recipe1.ingredient.clear()
+        self.assertEqual(self.search("plantain"), ["banana split"])
+
+    def test_deleted_recipe_is_not_found(self):
+        self.recipe2.delete()
+        self.assertEqual(self.search("banana"), [])
+
+class RecipeCursorPaginationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com")
+        self.user.set_password("test")
+        self.user.save()
+
+        for i in range(25):
+            Recipe.objects.create(recipe_author=self.user, name=f"recipe {i % 3}", text="Ovo je recept")
+        self.client.force_authenticate(user=self.user)
+
+    def collect(self, url, data=None):
+        recipes = []
+        pages = 0
+        while url:
+            response = self.client.get(url, data=data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            recipes += response.json()["results"]
+            url, data = response.json()["next"], None
+            pages += 1
+        return recipes, pages
+
+    def test_cursor_pages_follow_recipe_ordering(self):
+        recipes, pages = self.collect(reverse('all_recipes'), {"pagination": "cursor"})
+
+        self.assertEqual(pages, 3)
+        self.assertEqual([recipe["name"] for recipe in recipes],
+                         list(Recipe.objects.values_list("name", flat=True)))
+
+    def test_cursor_page_skips_count_unless_requested(self):
+        response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor"})
+        self.assertNotIn("count", response.json())
+        self.assertIsNone(response.json()["previous"])
+
+        response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor", "count": "true"})
+        self.assertEqual(response.json()["count"], 25)
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.client.get(reverse('all_recipes'), data={"pagination": "cursor"}).json()
+        second = self.client.get(first["next"]).json()
+        previous = self.client.get(second["previous"]).json()
+
+        self.assertEqual(previous["results"], first["results"])
+        self.assertIsNotNone(previous["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor", "cursor": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_must_match_the_ordering(self):
+        paginator = KeysetPagination()
+        for ordering, values in ((None, ["x", "abc"]), (None, ["x", None]), ("-created_at", ["yesterday", 1])):
+            cursor = paginator.encode_cursor(values, False)
+            response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor", "cursor": cursor,
+                                                                     **({"ordering": ordering} if ordering else {})})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_search_is_not_paged_with_a_cursor(self):
+        response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor", "search": "recipe"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        recipes, _ = self.collect(reverse('all_recipes'), {"pagination": "cursor", "search": "recipe",
+                                                           "ordering": "name"})
+        self.assertEqual(len(recipes), 25)
+
+    def test_own_recipes_cursor_pagination(self):
+        recipes, pages = self.collect(reverse('user_recipes'), {"pagination": "cursor"})
+        self.assertEqual((len(recipes), pages), (25, 3))
+
+class IngredientUsageCountTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.user.set_password("test")
+        self.user.save()
+
+        self.ingredients = [Ingredient.objects.create(name=f"ingredient {i}") for i in range(1, 8)]
+        self.recipe1 = Recipe.objects.create(recipe_author=self.user, name="banana recipe", text="Ovo je banana recept")
+        self.recipe2 = Recipe.objects.create(recipe_author=self.user, name="ice cream recipe", text="Ovo je sladoled")
+        self.client.force_authenticate(user=self.user)
+
+    def usage(self):
+        return dict(Ingredient.objects.values_list("name", "usage_count"))
+
+    def test_usage_follows_ingredient_changes(self):
+        ingredient1, ingredient2, ingredient3 = self.ingredients[:3]
+        self.recipe1.ingredient.add(ingredient1, ingredient2)
+        self.recipe1.ingredient.add(ingredient1)
+        self.recipe2.ingredient.add(ingredient1, ingredient3)
+        ingredient3.ingredients.add(self.recipe1)
+        self.assertEqual(self.usage()["ingredient 1"], 2)
+        self.assertEqual(self.usage()["ingredient 3"], 2)
+
+        self.recipe1.ingredient.remove(ingredient2, self.ingredients[6])
+        self.assertEqual(self.usage()["ingredient 2"], 0)
+
+        ingredient3.ingredients.clear()
+        self.assertEqual(self.usage()["ingredient 3"], 0)
+
+        self.recipe2.delete()
+        self.assertEqual(self.usage()["ingredient 1"], 1)
+
+        self.recipe1.ingredient.clear()
+        self.assertEqual(set(self.usage().values()), {0})
+
+    def test_saving_stale_ingredient_keeps_usage(self):
+        ingredient = Ingredient.objects.get(pk=self.ingredients[0].pk)
+        self.recipe1.ingredient.add(ingredient)
+        ingredient.name = "renamed"
+        ingredient.save()
+
+        self.assertEqual(self.usage()["renamed"], 1)
+
+    def test_most_used_ingredients_limit(self):
+        for ingredient in self.ingredients:
+            self.recipe1.ingredient.add(ingredient)
+        self.recipe2.ingredient.add(self.ingredients[6])
+
+        response = self.client.get(reverse('top_5_most_used_ingredients'), data={"limit": 2})
+        self.assertEqual(response.json(), [{'name': 'ingredient 7'}, {'name': 'ingredient 1'}])
+
+        response = self.client.get(reverse('top_5_most_used_ingredients'), data={"limit": "abc"})
+        self.assertEqual(len(response.json()), 5)
+
+FAKE_EMAIL_VERIFICATION = {
+    'MODE': 'background',
+    'VERIFIER': 'backendrecipe.verification.FakeVerifier',
+    'VERIFIER_OPTIONS': {'statuses': {'mailinator.com': 'disposable', 'bad@gmail.com': 'invalid'}},
+    'WORKERS': 0,
+    'CACHE_SIZE': 100,
+    'ADDRESS_TTL': 60,
+    'DOMAIN_TTL': 60,
+    'DISPOSABLE_DOMAINS': ['yopmail.com'],
+}
+
+@override_settings(EMAIL_VERIFICATION=FAKE_EMAIL_VERIFICATION)
+class BackgroundEmailVerificationTest(APITestCase):
+    def setUp(self):
+        reset_verification_service()
+
+    def register(self, email):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('register'), data={"email": email,
+                                                                   "password": "nindza11",
+                                                                   "password2": "nindza11",
+                                                                   "first_name": "Nikola",
+                                                                   "last_name": "Van Dam"})
+        return response
+
+    def test_valid_email_is_verified_after_registration(self):
+        response = self.register("nikola@gmail.com")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(email="nikola@gmail.com")
+        self.assertEqual(user.email_status, "verified")
+        self.assertTrue(user.is_active)
+
+    def test_invalid_email_deactivates_pending_account(self):
+        response = self.register("bad@gmail.com")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(email="bad@gmail.com")
+        self.assertEqual(user.email_status, "rejected")
+        self.assertFalse(user.is_active)
+
+    def test_known_disposable_domain_is_rejected_without_lookup(self):
+        self.register("first@mailinator.com")
+        response = self.register("second@mailinator.com")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'non_field_errors': ['Email is not valid']})
+        self.assertEqual(get_verification_service().verifier.calls, ["first@mailinator.com"])
+
+    def test_configured_disposable_domain(self):
+        response = self.register("someone@yopmail.com")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_verification_service().verifier.calls, [])
+
+    @override_settings(EMAIL_VERIFICATION={**FAKE_EMAIL_VERIFICATION, 'MODE': 'sync'})
+    def test_sync_mode_caches_verdicts(self):
+        self.assertEqual(self.register("bad@gmail.com").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.register("bad@gmail.com").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.register("good@gmail.com").status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(User.objects.get(email="good@gmail.com").email_status, "verified")
+        self.assertEqual(get_verification_service().verifier.calls, ["bad@gmail.com", "good@gmail.com"])
+
+    @override_settings(EMAIL_VERIFICATION={**FAKE_EMAIL_VERIFICATION, 'RETRIES': 2, 'RETRY_BACKOFF': 0,
+                                           'VERIFIER_OPTIONS': {'failures': 2}})
+    def test_verifier_failures_are_retried(self):
+        self.register("nikola@gmail.com")
+
+        self.assertEqual(User.objects.get(email="nikola@gmail.com").email_status, "verified")
+        self.assertEqual(len(get_verification_service().verifier.calls), 3)
+
+    @override_settings(EMAIL_VERIFICATION={**FAKE_EMAIL_VERIFICATION, 'RETRIES': 1, 'RETRY_BACKOFF': 0,
+                                           'VERIFIER_OPTIONS': {'failures': 3}})
+    def test_pending_accounts_are_verified_again(self):
+        with self.assertLogs("backendrecipe.verification", "ERROR"):
+            self.register("nikola@gmail.com")
+        self.assertEqual(User.objects.get(email="nikola@gmail.com").email_status, "pending")
+
+        stdout = StringIO()
+        call_command("reverify_pending_emails", older_than=0, stdout=stdout, stderr=StringIO())
+        self.assertEqual(User.objects.get(email="nikola@gmail.com").email_status, "verified")
+        self.assertIn("Verified 1 pending accounts", stdout.getvalue())
+
+@override_settings(EMAIL_VERIFICATION={**FAKE_EMAIL_VERIFICATION, 'WORKERS': 2,
+                                       'VERIFIER_OPTIONS': {'latency': 0.05}})
+class EmailVerificationWorkerPoolTest(TransactionTestCase):
+    def test_registration_returns_before_verification(self):
+        response = self.client.post(reverse('register'), data={"email": "nikola@gmail.com",
+                                                               "password": "nindza11",
+                                                               "password2": "nindza11",
+                                                               "first_name": "Nikola",
+                                                               "last_name": "Van Dam"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User.objects.get(email="nikola@gmail.com").email_status, "pending")
+
+        get_verification_service()._executor.shutdown(wait=True)
+        self.assertEqual(User.objects.get(email="nikola@gmail.com").email_status, "verified")
+
+class BulkCreateRecipesViewTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.user.set_password("test")
+        self.user.save()
+
+        self.banana = Ingredient.objects.create(name="banana")
+        self.cream = Ingredient.objects.create(name="cream")
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_recipe_creation(self):
+        with self.assertNumQueries(14):
+            response = self.client.post(reverse('bulk_create_recipes'), data=[
+                {'name': 'banana split', 'text': 'Ovo je banana split', 'ingredient': [self.banana.id, self.cream.id]},
+                {'name': 'ice cream', 'text': 'Ovo je sladoled', 'ingredient': [self.cream.id, self.cream.id]},
+            ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.order_by('id')
+        self.assertEqual(response.json(), [
+            {'id': recipes[0].id, 'name': 'banana split', 'text': 'Ovo je banana split',
+             'ingredient': [self.banana.id, self.cream.id]},
+            {'id': recipes[1].id, 'name': 'ice cream', 'text': 'Ovo je sladoled', 'ingredient': [self.cream.id]},
+        ])
+        self.assertEqual(list(recipes[1].ingredient.all()), [self.cream])
+        self.assertEqual(recipes[0].recipe_author, self.user)
+        self.assertEqual(dict(Ingredient.objects.values_list("name", "usage_count")), {"banana": 1, "cream": 2})
+
+        response = self.client.get(reverse('all_recipes'), data={"search": "banana"})
+        self.assertEqual([recipe["name"] for recipe in response.json()["results"]], ["banana split"])
+
+    def test_bulk_recipe_creation_reports_errors_per_item(self):
+        response = self.client.post(reverse('bulk_create_recipes'), data=[
+            {'name': 'banana split', 'text': 'Ovo je banana split', 'ingredient': [self.banana.id]},
+            {'name': 'ice cream', 'ingredient': [999]},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [{}, {'text': ['This field is required.'],
+                                                'ingredient': ['Invalid pk "999" - object does not exist.']}])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_recipe_creation_is_limited(self):
+        recipe = {'name': 'banana split', 'text': 'Ovo je banana split', 'ingredient': [self.banana.id]}
+        response = self.client.post(reverse('bulk_create_recipes'), data=[recipe] * 1001, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'non_field_errors': ['Ensure this field has no more than 1000 elements.']})
+        self.assertFalse(Recipe.objects.exists())
+
+class RecipeRatingUpsertTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        self.recipe = Recipe.objects.create(recipe_author=self.user, name="banana recipe", text="Ovo je banana recept")
+        self.client.force_authenticate(user=self.otherUser)
+
+    def test_duplicate_ratings_are_rejected_by_the_database(self):
+        RecipeRating.objects.create(user=self.otherUser, recipe=self.recipe, rating=3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RecipeRating.objects.create(user=self.otherUser, recipe=self.recipe, rating=4)
+
+    def test_rating_is_a_single_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('rate'), data={"recipe": self.recipe.id, "rating": 4})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        inserts = [query["sql"] for query in queries if "reciperating" in query["sql"]]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn("ON CONFLICT", inserts[0])
+
+    def test_update_my_rating(self):
+        self.client.post(reverse('rate'), data={"recipe": self.recipe.id, "rating": 2})
+        response = self.client.put(reverse('rate'), data={"recipe": self.recipe.id, "rating": 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'recipe': self.recipe.id, 'rating': 5})
+        self.assertEqual(RecipeRating.objects.get().rating, 5)
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_count, self.recipe.rating_sum), (1, 5))
+
+    def test_deleted_ratings_leave_the_aggregates(self):
+        third = User.objects.create(email="test3@gmail.com")
+        RecipeRating.objects.rate(self.otherUser, self.recipe, 2)
+        RecipeRating.objects.rate(third, self.recipe, 4)
+
+        RecipeRating.objects.get(user=third).delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_count, self.recipe.rating_sum, self.recipe.rating_avg), (1, 2, 2.0))
+        self.otherUser.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_count, self.recipe.rating_sum, self.recipe.rating_avg), (0, 0, None))
+        self.assertEqual(self.recipe.rating_score, 3.0)
+
+    def test_update_mode_creates_missing_rating(self):
+        response = self.client.put(reverse('rate'), data={"recipe": self.recipe.id, "rating": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.avg_rating, 1)
+
+class ConditionalListTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        self.ingredient = Ingredient.objects.create(name="banana")
+        self.recipe = Recipe.objects.create(recipe_author=self.user, name="banana recipe", text="Ovo je banana recept")
+        self.recipe.ingredient.add(self.ingredient)
+        self.client.force_authenticate(user=self.otherUser)
+
+    def test_not_modified_without_queries(self):
+        for name in ('all_recipes', 'ingredients', 'top_5_most_used_ingredients'):
+            etag = self.client.get(reverse(name))["ETag"]
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_query_params(self):
+        etag = self.client.get(reverse('all_recipes'))["ETag"]
+        response = self.client.get(reverse('all_recipes'), data={"search": "banana"}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get(reverse('all_recipes'))["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('rate'), data={"recipe": self.recipe.id, "rating": 4})
+
+        response = self.client.get(reverse('all_recipes'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"][0]["avg_rating"], 4)
+
+    def test_recipe_changes_do_not_invalidate_ingredient_list(self):
+        etag = self.client.get(reverse('ingredients'))["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(recipe_author=self.user, name="ice cream", text="Ovo je sladoled")
+
+        response = self.client.get(reverse('ingredients'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+class OwnRecipesFeedCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        self.ingredient = Ingredient.objects.create(name="banana")
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(12):
+                recipe = Recipe.objects.create(recipe_author=self.user, name=f"recipe {i:02}", text="Ovo je recept")
+                recipe.ingredient.add(self.ingredient)
+        self.recipe = recipe
+        self.client.force_authenticate(user=self.user)
+
+    def test_feed_is_paginated_and_prefetched(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user_recipes'))
+
+        self.assertEqual(response.json()['count'], 12)
+        self.assertEqual(len(response.json()['results']), 10)
+
+    def test_repeated_feed_request_is_served_from_cache(self):
+        first = self.client.get(reverse('user_recipes'), data={"page": 2})
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('user_recipes'), data={"page": 2})
+
+        self.assertEqual(second.json(), first.json())
+
+    def test_rating_invalidates_only_the_authors_feed(self):
+        self.client.get(reverse('user_recipes'), data={"page": 2})
+        self.client.force_authenticate(user=self.otherUser)
+        self.client.get(reverse('user_recipes'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('rate'), data={"recipe": self.recipe.id, "rating": 5})
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('user_recipes'))
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('user_recipes'), data={"page": 2})
+        self.assertEqual(response.json()['results'][-1]['avg_rating'], 5)
+
+    def test_recipe_changes_invalidate_the_feed(self):
+        self.client.get(reverse('user_recipes'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(recipe_author=self.user, name="another recipe", text="Ovo je recept")
+
+        response = self.client.get(reverse('user_recipes'))
+        self.assertEqual(response.json()['count'], 13)
+        self.assertEqual(response.json()['results'][0]['name'], "another recipe")
+
+    def test_other_users_recipes_keep_the_feed(self):
+        etag = self.client.get(reverse('user_recipes'))["ETag"]
+        self.client.force_authenticate(user=self.otherUser)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('create_recipes'), data={
+                "name": "banana split", "text": "Ovo je recept", "ingredient": [self.ingredient.id]})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('user_recipes'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+class IngredientSuggestViewTest(APITestCase):
+    def setUp(self):
+        reset_ingredient_index()
+        self.addCleanup(reset_ingredient_index)
+        self.user = User.objects.create(email="test@gmail.com")
+        self.banana = Ingredient.objects.create(name="Banana")
+        self.bacon = Ingredient.objects.create(name="bacon")
+        self.basil = Ingredient.objects.create(name="basil")
+        Ingredient.objects.create(name="apple")
+        recipe = Recipe.objects.create(recipe_author=self.user, name="banana split", text="Ovo je banana split")
+        recipe.ingredient.add(self.bacon, self.basil)
+        other = Recipe.objects.create(recipe_author=self.user, name="pesto", text="Ovo je pesto")
+        other.ingredient.add(self.basil)
+        self.client.force_authenticate(user=self.user)
+
+    def suggest(self, query, **params):
+        response = self.client.get(reverse('ingredient_suggest'), data={"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [ingredient["name"] for ingredient in response.json()]
+
+    def test_suggestions_are_ranked_by_usage(self):
+        self.assertEqual(self.suggest("BA"), ["basil", "bacon", "Banana"])
+        self.assertEqual(self.suggest("ba", limit=1), ["basil"])
+        self.assertEqual(self.suggest("ban"), ["Banana"])
+        self.assertEqual(self.suggest(""), [])
+
+    def test_suggestions_are_served_from_memory(self):
+        self.suggest("ba")
+        with self.assertNumQueries(0):
+            self.suggest("b")
+
+    def test_index_is_updated_incrementally(self):
+        self.suggest("ba")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ingredients'), data={"name": "baking soda"})
+            self.banana.name = "plantain"
+            self.banana.save()
+            recipe = Recipe.objects.create(recipe_author=self.user, name="pancakes", text="Ovo su palacinke")
+            recipe.ingredient.add(self.bacon, Ingredient.objects.get(name="baking soda"))
+            recipe.ingredient.add(Ingredient.objects.get(name="baking soda"))
+            self.bacon.ingredients.add(Recipe.objects.get(name="pesto"))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("ba"), ["bacon", "basil", "baking soda"])
+            self.assertEqual(self.suggest("pl"), ["plantain"])
+
+class ProjectedRecipeListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        ingredients = [Ingredient.objects.create(name=name) for name in ("banana", "čokolada\u2028", "vanilla")]
+        for i in range(12):
+            recipe = Recipe.objects.create(recipe_author=self.user if i % 3 else self.otherUser,
+                                           name=f"banana split {i % 4}", text="Ovo je banana recept")
+            recipe.ingredient.add(*ingredients[:i % 3 + 1])
+            if i % 2:
+                RecipeRating.objects.create(user=self.otherUser, recipe=recipe, rating=i % 5 + 1)
+        self.client.force_authenticate(user=self.user)
+
+    def get_both(self, url, data=None):
+        bodies = []
+        for projected in (False, True):
+            cache.clear()
+            with self.settings(RECIPE_PROJECTED_LISTS=projected):
+                response = self.client.get(url, data=data)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            bodies.append(response.content)
+        return bodies
+
+    def test_same_body_as_serializer(self):
+        for url, data in ((reverse('all_recipes'), None),
+                          (reverse('all_recipes'), {"page": 2}),
+                          (reverse('all_recipes'), {"search": "banana vanilla"}),
+                          (reverse('all_recipes'), {"pagination": "cursor", "count": "true"}),
+                          (reverse('user_recipes'), None)):
+            serialized, projected = self.get_both(url, data)
+            self.assertEqual(serialized, projected)
+
+    def test_cursor_links_match(self):
+        cache.clear()
+        with self.settings(RECIPE_PROJECTED_LISTS=True):
+            next_url = self.client.get(reverse('all_recipes'), data={"pagination": "cursor"}).json()["next"]
+        serialized, projected = self.get_both(next_url)
+        self.assertEqual(serialized, projected)
+
+    def test_fewer_queries(self):
+        with self.settings(RECIPE_PROJECTED_LISTS=True), self.assertNumQueries(3):
+            self.client.get(reverse('all_recipes'))
+
+    def test_renderer_escapes_line_separators(self):
+        from backendrecipe.renderers import FastJSONRenderer
+        from rest_framework.renderers import JSONRenderer
+        data = {"name": "a\u2028b\u2029", "rating": 3.5, "when": None, "items": ("x", 1)}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertIn(b"\\u2028", FastJSONRenderer().render(data))
+
+class MetricsTest(APITestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create(email="test@gmail.com")
+        self.ingredient = Ingredient.objects.create(name="banana")
+        self.client.force_authenticate(user=self.user)
+
+    def test_records_route_latency_and_queries(self):
+        self.client.get(reverse('ingredients'))
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/recipes/ingredients/",'
+                      'status="200"} 1', body)
+        self.assertIn('db_queries_per_request_count{route="/api/recipes/ingredients/"} 1', body)
+        self.assertNotIn("n_plus_one_suspected_total{", body)
+
+    def test_flags_repeated_statements(self):
+        for i in range(10):
+            recipe = Recipe.objects.create(recipe_author=self.user, name=f"banana {i}", text="Ovo je banana recept")
+            recipe.ingredient.add(self.ingredient)
+        with self.settings(RECIPE_PROJECTED_LISTS=False), \
+                mock.patch.object(ListAllRecipesView, "queryset", Recipe.objects.all()), \
+                self.assertLogs("backendrecipe.metrics", "WARNING"):
+            self.client.get(reverse('all_recipes'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('n_plus_one_suspected_total{route="/api/recipes/"} 1', body)
+
+    def test_outbound_calls(self):
+        with self.assertRaises(ValueError), track_outbound("hunter"):
+            raise ValueError
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('outbound_http_duration_seconds_count{service="hunter"} 1', body)
+        self.assertIn('outbound_http_errors_total{service="hunter"} 1', body)
+
+    def test_only_served_locally(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ImportRecipesCommandTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.ingredient = Ingredient.objects.create(name="banana")
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_import_jsonl(self):
+        rows = [
+            {"author_email": "test@gmail.com", "name": "banana split", "text": "Ovo je banana split",
+             "ingredients": ["banana", "vanilla", "banana"]},
+            {"author_email": "nobody@gmail.com", "name": "ice cream", "text": "Ovo je sladoled",
+             "ingredients": ["vanilla"]},
+            {"author_email": "test@gmail.com", "name": "cake", "text": "Ovo je kolac", "ingredients": []},
+        ]
+        path = self.write("recipes.jsonl", "\n".join(json.dumps(row) for row in rows) + "\nnot json\n")
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_recipes", path, batch_size=2, stdout=StringIO(), stderr=StringIO())
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.recipe_author, self.user)
+        self.assertEqual(sorted(recipe.ingredient.values_list("name", flat=True)), ["banana", "vanilla"])
+        self.assertEqual(Ingredient.objects.get(name="banana").usage_count, 1)
+        self.assertEqual(Ingredient.objects.get(name="vanilla").usage_count, 1)
+        self.assertFalse(RecipeImport.objects.exists())
+
+    def test_import_csv_resumes(self):
+        path = self.write("recipes.csv", "author_email,name,text,ingredients\n"
+                                         'test@gmail.com,banana split,"Ovo je, banana",banana|vanilla\n'
+                                         "test@gmail.com,ice cream,Ovo je sladoled,vanilla\n"
+                                         "test@gmail.com,pancakes,Ovo su palacinke,flour|egg\n")
+        RecipeImport.objects.create(path=os.path.abspath(path), rows=1, imported=1)
+        call_command("import_recipes", path, stdout=StringIO())
+
+        self.assertEqual(sorted(Recipe.objects.values_list("name", flat=True)), ["ice cream", "pancakes"])
+        self.assertEqual(Ingredient.objects.count(), 4)
+
+    def test_interrupted_import_resumes_without_duplicates(self):
+        from recipes.management.commands.import_recipes import Command
+        path = self.write("recipes.jsonl", "\n".join(json.dumps(
+            {"author_email": "test@gmail.com", "name": f"recipe {i}", "text": "Ovo je recept", "ingredients": ["banana"]}
+        ) for i in range(3)))
+        import_batch = Command.import_batch
+        calls = []
+
+        def interrupted(command, batch, using):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return import_batch(command, batch, using)
+        with mock.patch.object(Command, "import_batch", interrupted), self.assertRaises(KeyboardInterrupt):
+            call_command("import_recipes", path, batch_size=1, stdout=StringIO())
+        self.assertEqual(RecipeImport.objects.get().rows, 1)
+
+        call_command("import_recipes", path, batch_size=1, stdout=StringIO())
+        self.assertEqual(sorted(Recipe.objects.values_list("name", flat=True)), ["recipe 0", "recipe 1", "recipe 2"])
+        self.assertFalse(RecipeImport.objects.exists())
+
+class ExportRecipesTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        banana = Ingredient.objects.create(name="banana")
+        vanilla = Ingredient.objects.create(name="vanilla")
+        self.recipe1 = Recipe.objects.create(recipe_author=self.user, name="banana split", text="Ovo je, banana")
+        self.recipe1.ingredient.add(banana, vanilla)
+        self.recipe2 = Recipe.objects.create(recipe_author=self.user, name="plain", text="Bez sastojaka")
+        RecipeRating.objects.rate(self.otherUser, self.recipe1, 4)
+        self.client.force_authenticate(user=self.otherUser)
+
+    def test_ndjson(self):
+        response = self.client.get(reverse('export_recipes'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(records[0]["name"], "banana split")
+        self.assertEqual(sorted(records[0]["ingredients"]), ["banana", "vanilla"])
+        self.assertEqual(records[0]["avg_rating"], 4)
+        self.assertEqual(records[1], {"id": self.recipe2.id, "author_email": "test@gmail.com", "name": "plain",
+                                      "text": "Bez sastojaka", "ingredients": [], "avg_rating": None,
+                                      "rating_count": 0})
+
+    def test_csv(self):
+        response = self.client.get(reverse('export_recipes'), data={"output": "csv"})
+
+        rows = list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["text"], "Ovo je, banana")
+        self.assertEqual(sorted(rows[0]["ingredients"].split("|")), ["banana", "vanilla"])
+        self.assertEqual(rows[1]["avg_rating"], "")
+
+    def test_unknown_output(self):
+        response = self.client.get(reverse('export_recipes'), data={"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_command_output_can_be_imported(self):
+        out = StringIO()
+        call_command("export_recipes", stdout=out)
+        Recipe.objects.all().delete()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "recipes.jsonl")
+            with open(path, "w") as f:
+                f.write(out.getvalue())
+            call_command("import_recipes", path, stdout=StringIO())
+
+        self.assertEqual(sorted(Recipe.objects.values_list("name", flat=True)), ["banana split"])
+
+class CachedJWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com", first_name="Nikola", last_name="Anovic")
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('top_5_most_used_ingredients'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query for query in queries.captured_queries if "user_user" in query["sql"]]
+
+    def test_user_is_cached(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_saving_the_user_invalidates(self):
+        self.user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.client.get(reverse('top_5_most_used_ingredients'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(EMAIL_VERIFICATION={**FAKE_EMAIL_VERIFICATION, 'VERIFIER_OPTIONS': {'default': 'invalid'}})
+    def test_rejected_email_invalidates(self):
+        reset_verification_service()
+        self.user_queries()
+        get_verification_service().verify_in_background(self.user.id, self.user.email)
+
+        response = self.client.get(reverse('top_5_most_used_ingredients'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+@override_settings(REPLICA_DATABASES=["default"])
+class ReplicaRoutingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com")
+        Ingredient.objects.create(name="banana")
+        self.client.force_authenticate(user=self.user)
+        self.read_aliases = []
+        db_for_read = PrimaryReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            self.read_aliases.append(alias)
+            return alias
+        patcher = mock.patch.object(PrimaryReplicaRouter, "db_for_read", spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_list_reads_from_replica(self):
+        self.client.get(reverse('ingredients'))
+        self.assertEqual(set(self.read_aliases), {"default"})
+
+        self.read_aliases.clear()
+        self.client.get(reverse('user_recipes'))
+        self.assertEqual(set(self.read_aliases), {None})
+
+    def test_writes_pin_to_primary(self):
+        response = self.client.post(reverse('ingredients'), data={"name": "vanilla"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.read_aliases.clear()
+        self.client.get(reverse('ingredients'))
+        self.assertEqual(set(self.read_aliases), {None})
+        self.assertFalse(PrimaryReplicaRouter().allow_migrate("default", "recipes"))
+
+    def test_changed_lists_read_from_primary(self):
+        writer = User.objects.create(email="writer@gmail.com")
+        self.client.force_authenticate(user=writer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('ingredients'), data={"name": "vanilla"})
+
+        # Another user gets the new ETag, with a body from the primary.
+        self.client.force_authenticate(user=self.user)
+        self.read_aliases.clear()
+        self.client.get(reverse('ingredients'))
+        self.assertEqual(set(self.read_aliases), {None})
+
+        self.read_aliases.clear()
+        self.client.get(reverse('top_5_most_used_ingredients'))
+        self.assertEqual(set(self.read_aliases), {None})
+
+        cache.delete_many([f"db:pin:resource:{resource}" for resource in ("ingredient", "ingredient_usage")])
+        self.read_aliases.clear()
+        self.client.get(reverse('ingredients'))
+        self.assertEqual(set(self.read_aliases), {"default"})
+
+    def test_export_streams_from_replica(self):
+        Recipe.objects.create(recipe_author=self.user, name="banana split", text="Ovo je banana split")
+        response = self.client.get(reverse('export_recipes'))
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), 1)
+        self.assertEqual(set(self.read_aliases), {"default"})
+
+class AsyncViewsTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        get_clearbit_cache().clear()
+        self.addCleanup(get_clearbit_cache().clear)
+        self.user = User.objects.create(email="test@gmail.com", first_name="Nikola", last_name="Anovic")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        ingredients = [Ingredient.objects.create(name=name) for name in ("banana", "vanilla")]
+        for i in range(12):
+            recipe = Recipe.objects.create(recipe_author=self.user if i % 2 else self.otherUser,
+                                           name=f"banana split {i}", text="Ovo je banana recept")
+            recipe.ingredient.add(*ingredients[:i % 2 + 1])
+        self.auth = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth)
+
+    async def test_lists_match_sync_views(self):
+        for sync_name, async_name, data in (('all_recipes', 'async_all_recipes', {}),
+                                            ('all_recipes', 'async_all_recipes', {"page": 2}),
+                                            ('all_recipes', 'async_all_recipes', {"search": "vanilla"}),
+                                            ('user_recipes', 'async_user_recipes', {})):
+            expected = (await sync_to_async(self.client.get)(reverse(sync_name), data=data)).json()
+            response = await self.async_client.get(reverse(async_name), data, AUTHORIZATION=self.auth)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected["next"] = expected["next"] and expected["next"].replace(reverse(sync_name), reverse(async_name))
+            expected["previous"] = expected["previous"] and \
+                expected["previous"].replace(reverse(sync_name), reverse(async_name))
+            self.assertEqual(response.json(), expected)
+
+    async def test_invalid_page_and_missing_token(self):
+        response = await self.async_client.get(reverse('async_all_recipes'), {"page": 9}, AUTHORIZATION=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get(reverse('async_all_recipes'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_user_info(self):
+        clearbit = mock.AsyncMock(return_value={"person": None})
+        with mock.patch("backendrecipe.utils.clearbit_info_async", clearbit):
+            response = await self.async_client.get(reverse('async_info', kwargs={"pk": self.user.id}),
+                                                   AUTHORIZATION=self.auth)
+            other = await self.async_client.get(reverse('async_info', kwargs={"pk": self.otherUser.id}),
+                                                AUTHORIZATION=self.auth)
+
+        self.assertEqual(response.json(), {"email": "test@gmail.com", "first_name": "Nikola",
+                                           "last_name": "Anovic", "clear_bit": {"person": None}})
+        self.assertEqual(other.status_code, status.HTTP_403_FORBIDDEN)
+        clearbit.assert_awaited_once_with("test@gmail.com")
+
+    async def test_clearbit_answers_match_the_sync_client(self):
+        import httpx
+        from clearbit.enrichment import PersonCompany
+        answers = iter([(202, None), (200, {"person": {"bio": None}}), (404, None), (500, None)])
+
+        def respond(request):
+            code, body = next(answers)
+            return httpx.Response(code, json=body)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        with mock.patch("backendrecipe.utils.get_async_client", return_value=client):
+            pending = await clearbit_info_async("test@gmail.com")
+            found = await clearbit_info_async("test@gmail.com")
+            missing = await clearbit_info_async("test@gmail.com")
+            with self.assertRaises(httpx.HTTPStatusError):
+                await clearbit_info_async("test@gmail.com")
+
+        self.assertEqual((type(pending), pending), (PersonCompany, {"pending": True}))
+        self.assertEqual((type(found), found), (PersonCompany, {"person": {"bio": None}}))
+        self.assertEqual(missing, NO_CLEARBIT_INFO)
+
+    def test_pending_clearbit_lookups_are_retried_soon(self):
+        now = [0]
+        lookups = TTLCache(ttl=3600, pending_ttl=60, is_pending=is_clearbit_pending, clock=lambda: now[0])
+        lookups.set("test@gmail.com", {"pending": True})
+        now[0] = 61
+        self.assertIsNone(lookups.get("test@gmail.com"))
+        self.assertEqual(get_clearbit_cache().pending_ttl, settings.CLEARBIT_CACHE["PENDING_TTL"])
+
+    @override_settings(EMAIL_VERIFICATION={**FAKE_EMAIL_VERIFICATION, 'MODE': 'sync'})
+    async def test_register(self):
+        reset_verification_service()
+        data = {"email": "new@gmail.com", "password": "Password-123", "password2": "Password-123",
+                "first_name": "Novi", "last_name": "Korisnik"}
+        response = await self.async_client.post(reverse('async_register'), data, content_type="application/json")
+        rejected = await self.async_client.post(reverse('async_register'), {**data, "email": "x@mailinator.com"},
+                                                content_type="application/json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json(), {"email": "new@gmail.com", "first_name": "Novi", "last_name": "Korisnik"})
+        self.assertEqual(rejected.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_verification_service().verifier.calls, ["new@gmail.com", "x@mailinator.com"])
+
+THROTTLED_REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {
+    'ingredient': '2/min', 'ingredient_ip': '3/min', 'register_ip': '1/hour'}}
+
+@override_settings(REST_FRAMEWORK=THROTTLED_REST_FRAMEWORK)
+class ThrottlingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        self.client.force_authenticate(user=self.user)
+        patcher = mock.patch.object(SlidingWindowThrottle, "timer", mock.Mock(return_value=6000.0))
+        self.timer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_user_limit_and_headers(self):
+        responses = [self.client.post(reverse('ingredients'), data={"name": name})
+                     for name in ("banana", "vanilla", "honey")]
+
+        self.assertEqual([r.status_code for r in responses], [201, 201, 429])
+        self.assertEqual([r["X-RateLimit-Remaining"] for r in responses], ["1", "0", "0"])
+        self.assertEqual(responses[0]["X-RateLimit-Limit"], "2")
+        self.assertEqual(responses[2]["Retry-After"], "60")
+        # Only POST is throttled.
+        response = self.client.get(reverse('ingredients'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("X-RateLimit-Remaining", response)
+
+    def test_ip_limit_is_shared_by_users(self):
+        self.client.post(reverse('ingredients'), data={"name": "banana"})
+        self.client.post(reverse('ingredients'), data={"name": "vanilla"})
+        self.client.force_authenticate(user=self.otherUser)
+
+        self.assertEqual(self.client.post(reverse('ingredients'), data={"name": "honey"}).status_code, 201)
+        self.assertEqual(self.client.post(reverse('ingredients'), data={"name": "mint"}).status_code, 429)
+        # Turned away by the address limit, so not counted against the user.
+        self.assertEqual(cache.get(f"throttle:ingredient:user:{self.otherUser.pk}:100"), 1)
+
+    def test_window_slides(self):
+        self.client.post(reverse('ingredients'), data={"name": "banana"})
+        self.client.post(reverse('ingredients'), data={"name": "vanilla"})
+
+        # Half way into the next minute half of the previous one still counts.
+        self.timer.return_value = 6090.0
+        self.assertEqual(self.client.post(reverse('ingredients'), data={"name": "honey"}).status_code, 201)
+        response = self.client.post(reverse('ingredients'), data={"name": "mint"})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "30")
+
+    async def test_async_register_is_throttled_per_ip(self):
+        data = {"email": "bad-email", "password": "Password-123", "password2": "Password-123"}
+        first = await self.async_client.post(reverse('async_register'), data, content_type="application/json")
+        second = await self.async_client.post(reverse('async_register'), data, content_type="application/json")
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(second["X-RateLimit-Remaining"], "0")
+        self.assertEqual(second["Retry-After"], "1200")
+
+class SimilarRecipesTest(APITestCase):
+    def setUp(self):
+        reset_similarity_index()
+        self.addCleanup(reset_similarity_index)
+        self.user = User.objects.create(email="test@gmail.com")
+        self.client.force_authenticate(user=self.user)
+        a, b, c, d, *extra = [Ingredient.objects.create(name=f"ingredient {i}") for i in range(11)]
+        self.recipes = {}
+        for name, ingredients in (("target", [a, b, c, d]), ("closest", [a, b, c, d, extra[0]]),
+                                  ("small", [a]), ("large", [a, b, c, *extra]), ("unrelated", [extra[0]])):
+            self.recipes[name] = Recipe.objects.create(recipe_author=self.user, name=name, text="Ovo je recept")
+            self.recipes[name].ingredient.add(*ingredients)
+        self.ingredients = (a, b, c, d, extra)
+
+    def similar(self, name="target", **params):
+        response = self.client.get(reverse('similar_recipes', kwargs={"pk": self.recipes[name].pk}), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(recipe["name"], round(recipe["similarity"], 4)) for recipe in response.json()]
+
+    def test_ranking(self):
+        self.assertEqual(self.similar(), [("closest", 0.8), ("large", 0.2727), ("small", 0.25)])
+        self.assertEqual(self.similar(metric="cosine"), [("closest", 0.8944), ("small", 0.5), ("large", 0.4743)])
+        self.assertEqual(self.similar(limit=1), [("closest", 0.8)])
+        with mock.patch("recipes.similarity.numpy", None):
+            self.assertEqual(self.similar(metric="cosine"),
+                             [("closest", 0.8944), ("small", 0.5), ("large", 0.4743)])
+
+        response = self.client.get(reverse('similar_recipes', kwargs={"pk": self.recipes["target"].pk}))
+        self.assertEqual(response.json()[0], {"id": self.recipes["closest"].pk, "recipe_author": self.user.pk,
+                                              "name": "closest", "text": "Ovo je recept",
+                                              "ingredient": [{"name": f"ingredient {i}"} for i in (0, 1, 2, 3, 4)],
+                                              "avg_rating": None, "similarity": 0.8})
+
+    def test_errors(self):
+        response = self.client.get(reverse('similar_recipes', kwargs={"pk": 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('similar_recipes', kwargs={"pk": self.recipes["target"].pk}),
+                                   data={"metric": "euclid"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_is_updated_incrementally(self):
+        self.similar()
+        a, b, c, d, extra = self.ingredients
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes["unrelated"].ingredient.add(a, b, c, d)
+            self.recipes["unrelated"].ingredient.remove(extra[0])
+            self.recipes["closest"].delete()
+            extra[1].delete()
+
+        self.assertEqual(self.similar(), [("unrelated", 1.0), ("large", 0.3), ("small", 0.25)])
+
+    def test_index_is_read_from_the_built_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "similarity.idx")
+            call_command("build_similarity_index", output=path, stdout=StringIO())
+            with override_settings(RECIPE_SIMILARITY_INDEX=path), \
+                    mock.patch("recipes.similarity.SimilarityIndex.load") as load:
+                self.assertEqual(self.similar(), [("closest", 0.8), ("large", 0.2727), ("small", 0.25)])
+                self.assertIsNotNone(get_similarity_index().snapshot)
+            load.assert_not_called()
+
+class CookableRecipesTest(APITestCase):
+    def setUp(self):
+        reset_similarity_index()
+        self.addCleanup(reset_similarity_index)
+        self.user = User.objects.create(email="test@gmail.com")
+        self.client.force_authenticate(user=self.user)
+        self.banana, self.milk, self.honey, self.flour = [Ingredient.objects.create(name=name)
+                                                           for name in ("banana", "milk", "honey", "flour")]
+        for name, ingredients in (("smoothie", [self.banana, self.milk]), ("pancakes", [self.milk, self.flour]),
+                                  ("bread", [self.flour, self.honey, self.milk]), ("snack", [self.banana])):
+            Recipe.objects.create(recipe_author=self.user, name=name, text="Ovo je recept").ingredient.add(*ingredients)
+
+    def cookable(self, **params):
+        response = self.client.get(reverse('cookable_recipes'), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_ranked_by_coverage(self):
+        body = self.cookable(ingredient=[self.banana.pk, self.milk.pk])
+        self.assertEqual(body["count"], 3)
+        self.assertEqual([(r["name"], r["coverage"], r["missing"]) for r in body["results"]],
+                         [("smoothie", 1.0, []), ("snack", 1.0, []), ("pancakes", 0.5, ["flour"])])
+
+        body = self.cookable(ingredient=f"{self.banana.pk},{self.milk.pk}", min_coverage=1)
+        self.assertEqual([r["name"] for r in body["results"]], ["smoothie", "snack"])
+        with mock.patch("recipes.similarity.numpy", None):
+            body = self.cookable(ingredient=[self.milk.pk, self.honey.pk], min_coverage=0.6)
+        self.assertEqual([(r["name"], round(r["coverage"], 4)) for r in body["results"]], [("bread", 0.6667)])
+
+    def test_pagination(self):
+        ingredient_ids = [self.banana.pk, self.milk.pk, self.flour.pk]
+        with mock.patch.object(CustomPagination, "page_size", 3):
+            first = self.cookable(ingredient=ingredient_ids)
+            second = self.cookable(ingredient=ingredient_ids, page=2)
+
+        self.assertEqual(first["count"], 4)
+        self.assertEqual([r["name"] for r in first["results"]], ["smoothie", "pancakes", "snack"])
+        self.assertEqual([r["name"] for r in second["results"]], ["bread"])
+        self.assertIsNone(second["next"])
+
+    def test_pages_rank_only_up_to_the_page(self):
+        for i in range(20):
+            Recipe.objects.create(recipe_author=self.user, name=f"extra {i}", text="Ovo je recept") \
+                          .ingredient.add(*[self.banana, self.milk, self.honey, self.flour][:i % 4 + 1])
+        ranked = get_similarity_index().covering([self.banana.pk, self.milk.pk], 0.5)
+        full = sorted(ranked, key=lambda row: (-row[1], -row[2], row[0]))
+        self.assertEqual(list(ranked), full)
+        self.assertEqual(ranked[3:6], full[3:6])
+        with mock.patch("recipes.similarity.numpy", None):
+            self.assertEqual(get_similarity_index().covering([self.banana.pk, self.milk.pk], 0.5)[3:6], full[3:6])
+
+        with mock.patch.object(CustomPagination, "page_size", 3), \
+                mock.patch("recipes.similarity.numpy.lexsort", wraps=numpy.lexsort) as sort:
+            body = self.cookable(ingredient=[self.banana.pk, self.milk.pk], page=2)
+        self.assertEqual(body["count"], len(full))
+        self.assertEqual([r["id"] for r in body["results"]], [recipe_id for recipe_id, _, _ in full[3:6]])
+        self.assertLess(len(sort.call_args.args[0][0]), len(full))
+
+    def test_invalid_params(self):
+        for params in ({}, {"ingredient": "banana"}, {"ingredient": self.milk.pk, "min_coverage": 0},
+                       {"ingredient": self.milk.pk, "min_coverage": "all"}):
+            response = self.client.get(reverse('cookable_recipes'), data=params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class IngredientPairsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="test@gmail.com")
+        self.client.force_authenticate(user=self.user)
+        self.banana, self.milk, self.honey, self.flour = [Ingredient.objects.create(name=name)
+                                                           for name in ("banana", "milk", "honey", "flour")]
+        self.smoothie = Recipe.objects.create(recipe_author=self.user, name="smoothie", text="Ovo je smoothie")
+        self.smoothie.ingredient.add(self.banana, self.milk, self.honey)
+        self.pancakes = Recipe.objects.create(recipe_author=self.user, name="pancakes", text="Ovo su palacinke")
+        self.pancakes.ingredient.add(self.milk, self.flour)
+        self.pancakes.ingredient.add(self.banana)
+
+    def pairs(self, ingredient, **params):
+        response = self.client.get(reverse('ingredient_pairs', kwargs={"pk": ingredient.pk}), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(pair["name"], pair["recipe_count"]) for pair in response.json()]
+
+    def stored_counts(self):
+        return set(IngredientPair.objects.values_list("ingredient__name", "other__name", "recipe_count"))
+
+    def test_top_pairs(self):
+        self.assertEqual(self.pairs(self.milk), [("banana", 2), ("honey", 1), ("flour", 1)])
+        self.assertEqual(self.pairs(self.milk, limit=1), [("banana", 2)])
+        self.assertEqual(self.pairs(self.flour), [("banana", 1), ("milk", 1)])
+        response = self.client.get(reverse('ingredient_pairs', kwargs={"pk": 999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_counts_follow_link_changes(self):
+        self.smoothie.ingredient.remove(self.honey)
+        self.assertEqual(self.pairs(self.honey), [])
+        self.flour.ingredients.add(self.smoothie)
+        self.assertEqual(self.pairs(self.flour), [("banana", 2), ("milk", 2)])
+        self.pancakes.ingredient.clear()
+        self.assertEqual(self.pairs(self.milk), [("banana", 1), ("flour", 1)])
+        self.smoothie.delete()
+        self.assertFalse(IngredientPair.objects.exists())
+
+        recipe = Recipe.objects.create(recipe_author=self.user, name="toast", text="Ovo je tost")
+        recipe.ingredient.add(self.honey, self.flour, self.banana)
+        self.banana.delete()
+        self.assertEqual(self.stored_counts(), {("honey", "flour", 1), ("flour", "honey", 1)})
+
+    def test_rebuild_matches_incremental_counts(self):
+        self.smoothie.ingredient.remove(self.banana)
+        Recipe.objects.create(recipe_author=self.user, name="toast", text="Ovo je tost") \
+                      .ingredient.add(self.honey, self.flour, self.milk)
+        incremental = self.stored_counts()
+        IngredientPair.objects.all().delete()
+
+        call_command("rebuild_ingredient_pairs", batch_size=2, stdout=StringIO())
+
+        self.assertEqual(self.stored_counts(), incremental)
+        self.assertIn(("milk", "honey", 2), incremental)
+
+class TopRatedRecipesTest(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create(email="author@gmail.com")
+        self.voters = [User.objects.create(email=f"voter{i}@gmail.com") for i in range(3)]
+        self.recipes = {name: Recipe.objects.create(recipe_author=self.author, name=name, text="Ovo je recept")
+                        for name in ("one vote", "many votes", "unrated", "disliked")}
+        self.rate(self.voters[0], "one vote", 5)
+        for voter in self.voters:
+            self.rate(voter, "many votes", 4)
+        self.rate(self.voters[0], "disliked", 1)
+
+    def rate(self, user, name, rating, method="post"):
+        self.client.force_authenticate(user=user)
+        response = getattr(self.client, method)(reverse('rate'), data={"recipe": self.recipes[name].id,
+                                                                        "rating": rating})
+        self.assertIn(response.status_code, (status.HTTP_200_OK, status.HTTP_201_CREATED))
+
+    def top_rated(self, **params):
+        response = self.client.get(reverse('top_rated_recipes'), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(recipe["name"], round(recipe["score"], 3)) for recipe in response.json()["results"]]
+
+    def test_bayesian_ranking(self):
+        # Ten votes of 3 are added to every recipe: (30 + 12) / 13 beats (30 + 5) / 11.
+        self.assertEqual(self.top_rated(), [("many votes", 3.231), ("one vote", 3.182), ("unrated", 3.0),
+                                            ("disliked", 2.818)])
+        self.rate(self.voters[0], "one vote", 1, method="put")
+        self.assertEqual(self.top_rated()[1:], [("unrated", 3.0), ("one vote", 2.818), ("disliked", 2.818)])
+
+    def test_time_window(self):
+        RecipeRating.objects.filter(recipe=self.recipes["many votes"]) \
+                            .update(created_at=timezone.now() - timedelta(days=10))
+        self.rate(self.voters[1], "disliked", 2)
+
+        self.assertEqual(self.top_rated(window="week"), [("one vote", 3.182), ("disliked", 2.75)])
+        self.assertEqual(self.top_rated(window="month")[0], ("many votes", 3.231))
+        response = self.client.get(reverse('top_rated_recipes'), data={"window": "year"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_re_rating_counts_in_the_window(self):
+        RecipeRating.objects.update(created_at=timezone.now() - timedelta(days=10))
+        self.assertEqual(self.top_rated(window="week"), [])
+
+        self.rate(self.voters[1], "many votes", 5, method="put")
+        self.assertEqual(self.top_rated(window="week"), [("many votes", 3.182)])
+
+    def test_backfill_applies_new_prior(self):
+        with override_settings(RECIPE_RATING_PRIOR_MEAN=1.0, RECIPE_RATING_PRIOR_WEIGHT=1):
+            call_command("backfill_rating_aggregates", stdout=StringIO())
+        self.assertEqual(dict(Recipe.objects.values_list("name", "rating_score")),
+                         {"one vote": 3.0, "many votes": 3.25, "unrated": 1.0, "disliked": 1.0})
+
+class RecipeListFilterTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="test@gmail.com")
+        self.otherUser = User.objects.create(email="test2@gmail.com")
+        ingredients = [Ingredient.objects.create(name=name) for name in ("banana", "mlijeko", "šećer", "jaja")]
+        created_at = timezone.now() - timedelta(days=1)
+        self.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(recipe_author=self.user if i % 3 else self.otherUser,
+                                           name=f"recept {i:02}", text="Ovo je recept")
+            recipe.ingredient.add(*ingredients[:i % 4 + 1])
+            if i % 2:
+                RecipeRating.objects.rate(self.otherUser, recipe, i % 5 + 1)
+            # Minutes apart, but the last two at the same time.
+            Recipe.objects.filter(pk=recipe.pk).update(created_at=created_at + timedelta(minutes=min(i, 10)))
+            self.recipes.append(recipe)
+        self.client.force_authenticate(user=self.user)
+
+    def names(self, url=None, **params):
+        response = self.client.get(url or reverse('all_recipes'), data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe["name"] for recipe in response.json()["results"]]
+
+    def test_filters(self):
+        self.assertEqual(self.names(min_rating=4), ["recept 03", "recept 09"])
+        self.assertEqual(self.names(max_ingredients=1), ["recept 00", "recept 04", "recept 08"])
+        self.assertEqual(self.names(author=self.otherUser.id, max_ingredients=2),
+                         ["recept 00", "recept 09"])
+        self.assertEqual(self.names(reverse('user_recipes'), max_ingredients=1), ["recept 04", "recept 08"])
+        response = self.client.get(reverse('all_recipes'), data={"min_rating": "high"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        self.assertEqual(self.names(ordering="-created_at")[:3], ["recept 10", "recept 11", "recept 09"])
+        self.assertEqual(self.names(ordering="-rating_score")[:2], ["recept 09", "recept 03"])
+        self.assertEqual(self.names(ordering="-ingredient_count", min_rating=1),
+                         ["recept 03", "recept 07", "recept 11", "recept 01", "recept 05", "recept 09"])
+        # Unknown fields are ignored.
+        self.assertEqual(self.names(ordering="text"), self.names())
+
+    def test_cursor_pages_follow_ordering(self):
+        expected = list(Recipe.objects.order_by("-created_at", "id").values_list("name", flat=True))
+        for projected in (False, True):
+            with self.settings(RECIPE_PROJECTED_LISTS=projected):
+                response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor",
+                                                                         "ordering": "-created_at"})
+                names = [recipe["name"] for recipe in response.json()["results"]]
+                names += self.names(response.json()["next"])
+            self.assertEqual(names, expected)
+
+    def test_cursor_keeps_microseconds(self):
+        created_at = timezone.now().replace(microsecond=0)
+        for i, recipe in enumerate(self.recipes):
+            # All in the same millisecond.
+            Recipe.objects.filter(pk=recipe.pk).update(created_at=created_at + timedelta(microseconds=i * 50))
+        expected = [f"recept {i:02}" for i in reversed(range(12))]
+        for projected in (False, True):
+            with self.settings(RECIPE_PROJECTED_LISTS=projected):
+                response = self.client.get(reverse('all_recipes'), data={"pagination": "cursor",
+                                                                         "ordering": "-created_at"})
+                names = [recipe["name"] for recipe in response.json()["results"]]
+                names += self.names(response.json()["next"])
+            self.assertEqual(names, expected)
+
+    def test_ingredient_count_follows_links(self):
+        recipe = self.recipes[3]
+        recipe.ingredient.remove(Ingredient.objects.get(name="banana"))
+        Ingredient.objects.get(name="jaja").delete()
+        Recipe.objects.create(recipe_author=self.user, name="prazan", text="Ovo je recept")
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).ingredient_count, 2)
+        self.assertEqual(Recipe.objects.get(name="prazan").ingredient_count, 0)
+
+class FindRegressionsTest(SimpleTestCase):
+    baseline = {
+        "recipes": {"p95": 10.0, "queries": 3.0},
+        "rate": {"p95": 20.0, "queries": 4.0},
+        "removed": {"p95": 1.0, "queries": 1.0},
+    }
+
+    def test_within_tolerance(self):
+        results = {"recipes": {"p95": 11.9, "queries": 3.0}, "rate": {"p95": 5.0, "queries": 2.0},
+                   "new": {"p95": 100.0, "queries": 50.0}}
+        self.assertEqual(find_regressions(results, self.baseline, 0.2), [])
+
+    def test_slower_or_more_queries(self):
+        results = {"recipes": {"p95": 12.5, "queries": 3.0}, "rate": {"p95": 20.0, "queries": 4.5}}
+        self.assertEqual(find_regressions(results, self.baseline, 0.2), [
+            "recipes: p95 12.50ms, baseline 10.00ms",
+            "rate: 4.50 queries/request, baseline 4.00",
+        ])
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+USER_KEY = "user:auth:{}"
+
+
+def forget_user(user_id, using=None):
+    """Drop the cached user now and again after commit, so no request re-caches the old row."""
+    key = USER_KEY.format(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key), using=using)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps active users in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds, so authenticated requests do not read the
+    users table. Entries are dropped whenever a user is saved, deleted or
+    updated by the email verification.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            # Unknown and inactive users raise here and are never cached.
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
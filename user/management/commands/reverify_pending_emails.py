@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from backendrecipe.verification import get_verification_service
+from user.models import EMAIL_PENDING, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Verify the email addresses of accounts still pending, e.g. because the verifier was down "
+        "when they registered. Run it from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=10 * 60,
+                            help="Only accounts registered at least this many seconds ago, "
+                                 "younger ones may still be in the worker pool.")
+
+    def handle(self, *args, **options):
+        service = get_verification_service()
+        pending = User.objects.filter(email_status=EMAIL_PENDING,
+                                      created_at__lte=timezone.now() - timedelta(seconds=options["older_than"]))
+        settled = failed = 0
+        for user_id, email in pending.order_by("pk").values_list("pk", "email").iterator():
+            try:
+                service.verify_user(user_id, email)
+                settled += 1
+            except Exception as e:
+                self.stderr.write(f"Could not verify user {user_id}: {e}")
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Verified {settled} pending accounts, {failed} still pending."))
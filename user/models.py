@@ -2,6 +2,16 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 from django.contrib.auth.hashers import make_password
 
+EMAIL_PENDING = "pending"
+EMAIL_VERIFIED = "verified"
+EMAIL_REJECTED = "rejected"
+
+EMAIL_STATUS_CHOICES = [
+    (EMAIL_PENDING, "Pending verification"),
+    (EMAIL_VERIFIED, "Verified"),
+    (EMAIL_REJECTED, "Rejected"),
+]
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, first_name, last_name, password=None):
@@ -38,6 +48,7 @@ class User(AbstractBaseUser):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
+    email_status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, default=EMAIL_VERIFIED)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ("first_name", "last_name")
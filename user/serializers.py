@@ -1,7 +1,10 @@
 from rest_framework import serializers
-from user.models import User
+from user.models import User, EMAIL_PENDING
+from django.conf import settings
 from django.contrib.auth.password_validation import validate_password
-from backendrecipe.utils import clearbit_info, hunter_verify
+from django.db import transaction
+from backendrecipe.utils import cached_clearbit_info
+from backendrecipe.verification import get_verification_service
 
 
 
@@ -21,21 +24,33 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         if attrs['password'] != attrs['password2']:
             raise serializers.ValidationError({"password": "Password fields didn't match."})
-        if not hunter_verify(attrs['email']):
+        if self.verify_in_background():
+            email_is_valid = not get_verification_service().is_known_invalid(attrs['email'])
+        else:
+            email_is_valid = get_verification_service().is_valid(attrs['email'])
+        if not email_is_valid:
             raise serializers.ValidationError("Email is not valid")
 
         return attrs
 
+    def verify_in_background(self):
+        return settings.EMAIL_VERIFICATION['MODE'] == 'background'
+
     def create(self, validated_data):
-        user = User.objects.create(
+        user = User(
             email=validated_data['email'],
             first_name=validated_data['first_name'],
             last_name=validated_data['last_name']
         )
-        
+        if self.verify_in_background():
+            user.email_status = EMAIL_PENDING
+
         user.set_password(validated_data['password'])
         user.save()
 
+        if self.verify_in_background():
+            transaction.on_commit(lambda: get_verification_service().verify_in_background(user.pk, user.email))
+
         return user
 
 class UserSerializer(serializers.ModelSerializer):
@@ -46,7 +61,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ("email", "first_name", "last_name", "clear_bit")
 
     def get_clear_bit(self, obj):
-        return clearbit_info(obj.email)
+        return cached_clearbit_info(obj.email)
 
 class AdminUserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,10 +1,12 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from user.views import UserRegisterView, UserInfo
+from user.views import UserRegisterView, UserInfo, AsyncUserRegisterView, AsyncUserInfo
 
 urlpatterns = [
     path('register/', UserRegisterView.as_view(), name="register"),
     path('login/', TokenObtainPairView.as_view(), name='login'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('info/<pk>/', UserInfo.as_view(), name="info"),
+    path('async/register/', AsyncUserRegisterView.as_view(), name="async_register"),
+    path('async/info/<pk>/', AsyncUserInfo.as_view(), name="async_info"),
 ]
\ No newline at end of file
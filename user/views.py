@@ -1,5 +1,11 @@
-from rest_framework import generics
+from asgiref.sync import sync_to_async
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from backendrecipe.async_views import AsyncAPIView
+from backendrecipe.routers import ReplicaReadMixin
+from backendrecipe.utils import cached_clearbit_info_async
+from backendrecipe.verification import get_verification_service
 from .permissions import IsUserProfileAndReadOnly
 from .models import User
 from .serializers import UserRegisterSerializer, UserSerializer
@@ -8,8 +14,47 @@ class UserRegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegisterSerializer
     permission_classes = [AllowAny]
+    throttle_scope = "register"
 
-class UserInfo(generics.RetrieveAPIView):
+class UserInfo(ReplicaReadMixin, generics.RetrieveAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsUserProfileAndReadOnly]
+    throttle_scope = "enrichment"
+
+class AsyncUserRegisterView(AsyncAPIView):
+    """UserRegisterView that awaits Hunter instead of blocking a worker on it."""
+    authentication_required = False
+    throttle_scope = "register"
+
+    async def post(self, request, *args, **kwargs):
+        data = self.parse(request)
+        serializer = UserRegisterSerializer(data=data)
+        email = data.get("email")
+        if not serializer.verify_in_background() and isinstance(email, str) and "@" in email:
+            # Validation below finds this verdict in the service's cache.
+            await get_verification_service().astatus(email)
+        if not await sync_to_async(serializer.is_valid)():
+            return self.render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        await sync_to_async(serializer.save)()
+        return self.render(serializer.data, status.HTTP_201_CREATED)
+
+class AsyncUserInfo(AsyncAPIView):
+    """UserInfo that awaits Clearbit instead of blocking a worker on it."""
+    throttle_scope = "enrichment"
+
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            user = await User.objects.filter(pk=pk).afirst()
+        except (TypeError, ValueError):
+            user = None
+        if user is None:
+            raise NotFound()
+        if user != request.user:
+            raise PermissionDenied()
+        return self.render({
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "clear_bit": await cached_clearbit_info_async(user.email),
+        })